@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+# Measures how many keyboard events per second each handheld's process_event
+# handles with the controller stubbed out. Run from the repository root:
+#     python benchmarks/chords.py [--src DIR] [handheld ...]
+# The key streams are generated from this tree's chord tables. --src replays
+# them against the src directory of another checkout, e.g. one made with
+# git worktree at an older commit, to compare before and after.
+
+# Python Modules
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+# Partial imports
+from evdev import InputEvent, ecodes as e
+
+HANDHELDS = sorted(
+    name[:-3]
+    for name in os.listdir(os.path.join(SRC, "handycon", "handhelds"))
+    if "_gen" in name and name.endswith(".py")
+)
+BUTTON_MAP = {
+    "button1": "SCR",
+    "button2": "QAM",
+    "button3": "ESC",
+    "button4": "OSK",
+    "button5": "MODE",
+    "button6": "OPEN_CHIMERA",
+    "button7": "TOGGLE_PERFORMANCE",
+    "button8": "THUMBL",
+    "button9": "THUMBR",
+}
+SEQUENCES = 20000
+SEED = 2
+# The best of this many runs is reported.
+RUNS = 5
+
+
+# Stands in for handycon.HandheldController and drops everything emitted. It
+# carries the state older trees kept on the controller.
+class NullController:
+    def __init__(self, devices, button_map):
+        self.devices = devices
+        self.button_map = button_map
+        self.event_queue = []
+        self.last_button = None
+        self.timers = self
+        self.BUTTON_DELAY = 0
+        self.LONG_PRESS_DELAY = 0.5
+
+    def call_later(self, delay, callback, *args):
+        return asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    def emit_event(self, event):
+        pass
+
+    async def emit_now(self, *args):
+        pass
+
+    async def do_rumble(self, *args):
+        pass
+
+    async def handle_key_down(self, *args):
+        await self.devices.handle_key_down(*args)
+
+    async def handle_key_up(self, *args):
+        await self.devices.handle_key_up(*args)
+
+
+# Presses every chord of a table among random other keys, with repeats. Each
+# key event comes with the keys held after it, as the capture loops track them.
+def chord_stream(table, count, seed):
+    generator = random.Random(seed)
+    presses = [
+        [code for code in range(e.KEY_MAX) if keys >> code & 1]
+        for chord in table.chords
+        for keys in chord.press
+    ]
+    stream = []
+    for _ in range(count):
+        if generator.random() < 0.9:
+            keys = generator.choice(presses)
+        else:
+            keys = generator.sample(range(1, 200), generator.randint(1, 3))
+        active = []
+        for code in keys:
+            active = sorted(active + [code])
+            stream.append((code, 1, active))
+        if generator.random() < 0.2:
+            stream.append((keys[-1], 2, active))
+        for code in keys:
+            active = [key for key in active if key != code]
+            stream.append((code, 0, active))
+    return stream
+
+
+# Imports handycon from src, replacing any handycon modules already loaded.
+def load(src):
+    for name in list(sys.modules):
+        if name == "handycon" or name.startswith("handycon."):
+            del sys.modules[name]
+    sys.path.insert(0, src)
+    return importlib.import_module("handycon.devices")
+
+
+# Returns the process_event arguments for each key of the stream in the form
+# the loaded tree takes them: held keys as a bitmask and a source since the
+# keyboards got their own queues, as a list before.
+def arguments(stream):
+    try:
+        from handycon.keystate import keys_to_mask
+    except ImportError:
+        keys_to_mask = list
+    try:
+        from handycon.actions import InputSource
+    except ImportError:
+        extra = ()
+    else:
+        extra = (InputSource("keyboard"),)
+    return [
+        (InputEvent(0, 0, e.EV_KEY, code, value), keys_to_mask(active), *extra)
+        for code, value, active in stream
+    ]
+
+
+def button_map():
+    try:
+        from handycon.actions import ACTION_MAP
+    except ImportError:
+        from handycon.constants import EVENT_MAP as ACTION_MAP
+    return {button: ACTION_MAP[name] for button, name in BUTTON_MAP.items()}
+
+
+# Returns the events per second and the number of events that raised. Older
+# trees raise on some chords. The queue is cleared and the run goes on, so they
+# are measured as well.
+async def measure(controller, process_event, calls):
+    errors = 0
+    start = time.perf_counter()
+    for args in calls:
+        try:
+            await process_event(*args)
+        except Exception:
+            errors += 1
+            controller.event_queue = []
+            controller.last_button = None
+    return len(calls) / (time.perf_counter() - start), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", default=SRC)
+    parser.add_argument("handhelds", nargs="*", default=HANDHELDS)
+    options = parser.parse_args()
+
+    streams = {}
+    for name in options.handhelds:
+        table = importlib.import_module(f"handycon.handhelds.{name}").CHORD_TABLE
+        streams[name] = chord_stream(table, SEQUENCES, SEED)
+
+    devices = load(options.src)
+    for name, stream in streams.items():
+        module = importlib.import_module(f"handycon.handhelds.{name}")
+        best = 0
+        for _ in range(RUNS):
+            controller = NullController(devices, button_map())
+            for loaded in (devices, module, sys.modules.get("handycon.chords")):
+                if loaded:
+                    loaded.handycon = controller
+            calls = arguments(stream)
+            rate, errors = asyncio.run(measure(controller, module.process_event, calls))
+            best = max(best, rate)
+        line = f"{name:10s} {best:12,.0f} ev/s"
+        if errors:
+            line += f" ({errors} of {len(calls)} events raised)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Local modules
+from .constants import *
+
+# Actions are the event lists a button can be mapped to. Each distinct event list
+# is interned once as a small integer ID, so the event queue and the instant and
+# queued checks compare integers instead of nested lists.
+action_ids = {}
+event_lists = []
+
+
+# Returns the action ID of an event list, assigning one on first use. Equal
+# lists share an ID, the same as comparing the lists themselves.
+def intern(event_list):
+    key = tuple(tuple(item) if isinstance(item, list) else item for item in event_list)
+    action = action_ids.get(key)
+    if action is None:
+        action = len(event_lists)
+        action_ids[key] = action
+        event_lists.append(event_list)
+    return action
+
+
+# Returns the event list of an action ID.
+def events(action):
+    return event_lists[action]
+
+
+ACTION_MAP = {name: intern(event_list) for name, event_list in EVENT_MAP.items()}
+INSTANT_ACTIONS = frozenset(intern(event_list) for event_list in INSTANT_EVENTS)
+QUEUED_ACTIONS = frozenset(intern(event_list) for event_list in QUEUED_EVENTS)
+
+
+# Chord state of one input source. Each keyboard device keeps its own so chords
+# from different devices can't consume each other's presses.
+class InputSource:
+    def __init__(self, name):
+        self.name = name
+        self.event_queue = {}  # Pending action IDs, used as an insertion ordered set
+        self.last_button = None  # Action ID of the chord being held
+        self.holds = {}  # Long press timers of held chords
+        self.held = {}  # (long action ID, press task) of chords still held
+        self.latency = None  # latency.LatencyHistogram of the device, if measured
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+
+# Local modules
+from .actions import ACTION_MAP, events
+from .keystate import keys_to_mask
+
+handycon = None
+
+# Chord modes.
+# KEY chords fire through handle_key_down/handle_key_up as soon as they are seen.
+# QUEUE chords are held in the event queue until release and then fired through
+# the handheld's last_button handling.
+KEY = 0
+QUEUE = 1
+
+
+def set_handycon(handheld_controller):
+    global handycon
+    handycon = handheld_controller
+
+
+# Returns the action ID for a chord's button. Button names are looked up in the
+# user's button map first so config changes apply without recompiling tables.
+def resolve(name):
+    if name in handycon.button_map:
+        return handycon.button_map[name]
+    return ACTION_MAP[name]
+
+
+# A single chord emitted by the handheld firmware for one physical button.
+# press is the list of active keys (or a list of alternative lists) that starts
+# the chord, release is the list of key codes that end it once no keys remain.
+# Presses are stored as key bitmasks to compare against keystate.KeyState.
+# QUEUE chords can name a long button. If the chord is still held after the
+# handheld's LONG_PRESS_DELAY, the long button fires right away in place of the
+# chord's own button and is released with the chord.
+class Chord:
+    def __init__(
+        self,
+        button,
+        press,
+        release,
+        value=1,
+        mode=KEY,
+        rumble=None,
+        release_rumble=None,
+        clears=(),
+        long=None,
+        long_rumble=None,
+    ):
+        if press and isinstance(press[0], int):
+            press = [press]
+        self.button = button
+        self.press = [keys_to_mask(keys) for keys in press]
+        self.release = frozenset(release)
+        self.value = value
+        self.mode = mode
+        self.rumble = rumble
+        self.release_rumble = release_rumble
+        self.clears = tuple(clears)
+        self.long = long
+        self.long_rumble = long_rumble
+
+
+# Compiles a handheld's chords into dictionary lookups. Presses are keyed by the
+# bitmask of active keys plus the press state and releases by the released key
+# code, so each event costs a single lookup regardless of the chord count.
+class ChordTable:
+    def __init__(self, chords, passthrough=(), queued=False):
+        self.chords = tuple(chords)
+        self.passthrough = frozenset(passthrough)
+        self.queued = queued
+        press = {}
+        release = {}
+        for chord in self.chords:
+            for keys in chord.press:
+                press.setdefault((keys, chord.value), []).append(chord)
+            for code in chord.release:
+                release.setdefault(code, []).append(chord)
+        self.press = {key: tuple(chords) for key, chords in press.items()}
+        self.release = {key: tuple(chords) for key, chords in release.items()}
+
+    # Captures keyboard events and translates them to virtual device events.
+    # active_keys is the bitmask of keys held once the event's batch was read and
+    # source is the actions.InputSource of the device it came from.
+    async def process(self, seed_event, active_keys, source):
+        # Loop variables
+        button_on = seed_event.value
+        event_queue = source.event_queue
+        this_button = None
+
+        # Automatically pass default keycodes we dont intend to replace.
+        if seed_event.code in self.passthrough:
+            handycon.emit_event(seed_event)
+
+        # Handle missed keys.
+        if self.queued and not active_keys and event_queue:
+            this_button = next(iter(event_queue))
+
+        if active_keys:
+            for chord in self.press.get((active_keys, button_on), ()):
+                button = resolve(chord.button)
+                if button in event_queue:
+                    continue
+                for name in chord.clears:
+                    cleared = resolve(name)
+                    event_queue.pop(cleared, None)
+                if chord.rumble:
+                    await handycon.do_rumble(*chord.rumble)
+                if chord.mode == QUEUE:
+                    event_queue[button] = None
+                    if chord.long:
+                        source.holds[chord] = handycon.timers.call_later(
+                            handycon.LONG_PRESS_DELAY,
+                            self.start_hold,
+                            seed_event,
+                            source,
+                            chord,
+                        )
+                else:
+                    await handycon.handle_key_down(seed_event, source, button)
+
+        elif button_on == 0:
+            for chord in self.release.get(seed_event.code, ()):
+                if chord.long:
+                    if chord in source.held:
+                        # The long press is written before its release.
+                        long, task = source.held.pop(chord)
+                        await task
+                        await handycon.emit_now(seed_event, events(long), 0, source)
+                        continue
+                    hold = source.holds.pop(chord, None)
+                    if hold:
+                        hold.cancel()
+                button = resolve(chord.button)
+                if button not in event_queue:
+                    continue
+                if chord.release_rumble:
+                    await handycon.do_rumble(*chord.release_rumble)
+                if chord.mode == QUEUE:
+                    this_button = button
+                else:
+                    await handycon.handle_key_up(seed_event, source, button)
+
+        if not self.queued:
+            # Clean up old button presses.
+            if source.last_button is not None:
+                await handycon.handle_key_up(seed_event, source, source.last_button)
+            return
+
+        # A missed key that was a KEY chord has been released by handle_key_up.
+        if this_button is not None and this_button not in event_queue:
+            this_button = None
+
+        # Create list of events to fire.
+        # Handle new button presses.
+        if this_button is not None and source.last_button is None:
+            del event_queue[this_button]
+            source.last_button = this_button
+            await handycon.emit_now(seed_event, events(this_button), 1, source)
+
+        # Clean up old button presses.
+        elif source.last_button is not None and this_button is None:
+            await handycon.emit_now(seed_event, events(source.last_button), 0, source)
+            source.last_button = None
+
+    # Called from the timer once a long chord has been held for LONG_PRESS_DELAY.
+    def start_hold(self, seed_event, source, chord):
+        del source.holds[chord]
+        button = resolve(chord.button)
+        if button not in source.event_queue:
+            return
+        del source.event_queue[button]
+        long = resolve(chord.long)
+        task = asyncio.ensure_future(self.hold(seed_event, source, chord, long))
+        source.held[chord] = (long, task)
+
+    async def hold(self, seed_event, source, chord, long):
+        if chord.long_rumble:
+            await handycon.do_rumble(*chord.long_rumble)
+        await handycon.emit_now(seed_event, events(long), 1, source)
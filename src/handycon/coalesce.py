@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import os
+
+# Local modules
+from .constants import *
+
+SYN_RECORD = EVENT_STRUCT.pack(0, 0, e.EV_SYN, e.SYN_REPORT, 0)
+STICK_AXES = (e.ABS_X, e.ABS_Y, e.ABS_RX, e.ABS_RY)
+
+
+# Limits how often analog stick motion is written to the virtual controller.
+# The controller passthrough keeps the newest value of each stick axis in latest
+# instead of forwarding it and calls update(). Stick values are written at most
+# rate times a second, right away if the last write is a period old and
+# otherwise from one timers.TimerScheduler deadline. Frames with anything other
+# than stick motion, such as a button edge, are never held back. They take the
+# pending stick values with them through take().
+class Coalescer:
+    def __init__(self, timers, ui_fd, rate, axes=STICK_AXES):
+        self.timers = timers
+        self.ui_fd = ui_fd
+        self.axes = frozenset(axes)
+        self.period = int(1e9 / rate)
+        self.latest = {}  # Axis code -> newest value not yet written
+        self.written = 0  # Time of the last stick write in ns
+        self.timer = None
+
+        # Statistics
+        self.writes = 0
+
+    # Writes the pending values now or arms the timer for the end of the period.
+    def update(self):
+        if not self.latest or self.timer:
+            return
+        deadline = self.written + self.period
+        if deadline <= self.timers.now():
+            self.flush()
+        else:
+            self.timer = self.timers.call_at(deadline, self.flush)
+
+    def flush(self):
+        self.timer = None
+        if self.latest:
+            os.write(self.ui_fd, self.take())
+
+    # Returns the pending values as a frame of records and clears them, for the
+    # caller to write ahead of its own frames.
+    def take(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        records = b"".join(
+            [
+                EVENT_STRUCT.pack(0, 0, e.EV_ABS, code, value)
+                for code, value in self.latest.items()
+            ]
+        )
+        self.latest.clear()
+        self.written = self.timers.now()
+        self.writes += 1
+        return records + SYN_RECORD
+
+    # Drops pending values, such as when the controller goes away.
+    def reset(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.latest.clear()
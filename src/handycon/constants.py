@@ -2,6 +2,8 @@
 # This file is part of Handheld Game Console Controller System (HandyGCCS)
 # Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
 
+import struct
+
 from evdev import AbsInfo, ecodes as e
 from pathlib import Path
 
@@ -274,8 +276,10 @@ QUEUED_EVENTS = [
     EVENT_QAM_NES,
     EVENT_SCR,
 ]
+EVENT_STRUCT = struct.Struct("llHHi")  # struct input_event
 FF_DELAY = 0.2
 HIDE_PATH = Path("/dev/input/.hidden/")
 HOME_PATH = Path("/home")
 JOY_MAX = 32767
 JOY_MIN = -32767
+TRACE_PATH = Path("/run/handygccs/trace")
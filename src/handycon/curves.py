@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Local modules
+from .constants import *
+
+# Partial imports
+from array import array
+
+# Axes shaped by the settings of each stick under [Sticks] and each trigger
+# under [Triggers].
+STICKS = {
+    "left": (e.ABS_X, e.ABS_Y),
+    "right": (e.ABS_RX, e.ABS_RY),
+}
+TRIGGERS = {
+    "left": e.ABS_Z,
+    "right": e.ABS_RZ,
+}
+TRIGGER_MAX = 255
+
+# Stick tables cover every 16 bit axis value and trigger tables every value from
+# 0 to TRIGGER_MAX. Tables are kept as (table, offset, mask) and a value is
+# looked up at (value + offset) & mask, so nothing out of range can raise.
+STICK_OFFSET = 32768
+STICK_MASK = 0xFFFF
+TRIGGER_MASK = TRIGGER_MAX
+
+
+# Response curve and deadzones of one stick or trigger, as fractions of full
+# deflection. Deflection inside deadzone reads as centered and deflection past
+# 1 - outer_deadzone, a trigger's saturation, as full. The curve maps what is left in between, scaled to
+# 0..1, onto 0..1. It is linear, exponential with the given exponent, or drawn
+# through (deflection, output) points.
+class Curve:
+    def __init__(
+        self,
+        shape="linear",
+        exponent=2.0,
+        points=(),
+        deadzone=0.0,
+        outer_deadzone=0.0,
+    ):
+        if shape not in ("linear", "exponential", "custom"):
+            raise ValueError(f"Unknown curve {shape}.")
+        if not 0 <= deadzone < 1 - outer_deadzone <= 1:
+            raise ValueError("Deadzones leave no range to move in.")
+        if shape == "custom":
+            points = sorted(points)
+            if len(points) < 2:
+                raise ValueError("A custom curve needs at least two points.")
+        self.shape = shape
+        self.exponent = exponent
+        self.points = tuple(points)
+        self.deadzone = deadzone
+        self.outer_deadzone = outer_deadzone
+
+    def is_identity(self):
+        return self.shape == "linear" and not self.deadzone and not self.outer_deadzone
+
+    def output(self, deflection):
+        if self.shape == "exponential":
+            return deflection**self.exponent
+        if self.shape == "custom":
+            points = self.points
+            if deflection <= points[0][0]:
+                return points[0][1]
+            for (x0, y0), (x1, y1) in zip(points, points[1:]):
+                if deflection <= x1:
+                    if x1 == x0:
+                        return y1
+                    return y0 + (y1 - y0) * (deflection - x0) / (x1 - x0)
+            return points[-1][1]
+        return deflection
+
+    # Returns the lookup table of shaped values for every raw value. Only the
+    # positive half is computed, the negative half mirrors it.
+    def table(self):
+        inner = self.deadzone
+        span = 1 - self.outer_deadzone - inner
+        half = []
+        for raw in range(STICK_OFFSET + 1):
+            deflection = min(raw / JOY_MAX, 1.0)
+            if deflection <= inner:
+                half.append(0)
+                continue
+            shaped = self.output(min((deflection - inner) / span, 1.0))
+            half.append(round(min(max(shaped, 0.0), 1.0) * JOY_MAX))
+        table = array("h", [-value for value in reversed(half)])
+        table.extend(half[1:STICK_OFFSET])
+        return table
+
+    # Returns the lookup table of shaped values for a trigger's 0..TRIGGER_MAX.
+    def trigger_table(self):
+        inner = self.deadzone
+        span = 1 - self.outer_deadzone - inner
+        table = array("h")
+        for raw in range(TRIGGER_MAX + 1):
+            deflection = raw / TRIGGER_MAX
+            if deflection <= inner:
+                table.append(0)
+                continue
+            shaped = self.output(min((deflection - inner) / span, 1.0))
+            table.append(round(min(max(shaped, 0.0), 1.0) * TRIGGER_MAX))
+        return table
+
+
+# Turns a trigger into a digital one. It reads as fully pulled once its shaped
+# value reaches press and as released once it drops to release again, so a
+# trigger resting near the threshold doesn't chatter.
+class Latch:
+    def __init__(self, press, release):
+        if not 0 <= release < press <= TRIGGER_MAX:
+            raise ValueError("The release threshold must be below the press one.")
+        self.press = press
+        self.release = release
+        self.on = False
+
+
+# Reads the curve of a stick or trigger from a section such as [Sticks]. Raises
+# ValueError for settings that don't parse.
+def read_curve(config, section, name, outer="outer_deadzone"):
+    section = config[section] if section in config else {}
+    shape = section.get(f"{name}_curve", "linear").strip()
+    points = ()
+    if shape not in ("linear", "exponential"):
+        # Anything else is a list of deflection:output points.
+        points = [
+            tuple(float(number) for number in point.split(":"))
+            for point in shape.split()
+        ]
+        if any(len(point) != 2 for point in points):
+            raise ValueError(f"Malformed {name}_curve points.")
+        shape = "custom"
+    return Curve(
+        shape,
+        float(section.get(f"{name}_exponent", "2")),
+        points,
+        float(section.get(f"{name}_deadzone", "0")),
+        float(section.get(f"{name}_{outer}", "0")),
+    )
+
+
+# Reads the digital mode of a trigger from the [Triggers] section. Returns None
+# for analog triggers.
+def read_latch(config, trigger):
+    section = config["Triggers"] if "Triggers" in config else {}
+    mode = section.get(f"{trigger}_mode", "analog").strip()
+    if mode == "analog":
+        return None
+    if mode != "digital":
+        raise ValueError(f"Unknown {trigger}_mode {mode}.")
+    press = float(section.get(f"{trigger}_press", "0.5"))
+    release = float(section.get(f"{trigger}_release", "0.4"))
+    return Latch(round(press * TRIGGER_MAX), round(release * TRIGGER_MAX))
+
+
+# Compiles the curves of each stick and trigger into a table per axis. Axes that
+# pass values through unchanged get no table.
+def build_tables(stick_curves, trigger_curves):
+    tables = {}
+    for stick, curve in stick_curves.items():
+        if curve.is_identity():
+            continue
+        entry = (curve.table(), STICK_OFFSET, STICK_MASK)
+        for axis in STICKS[stick]:
+            tables[axis] = entry
+    for trigger, curve in trigger_curves.items():
+        if not curve.is_identity():
+            tables[TRIGGERS[trigger]] = (curve.trigger_table(), 0, TRIGGER_MASK)
+    return tables
+
+
+# Returns an axis value shaped by its table and latch, for the decoded paths.
+# RawReader.compact does the same inline.
+def shape(code, value, tables, latches):
+    entry = tables.get(code)
+    if entry:
+        table, offset, mask = entry
+        value = table[(value + offset) & mask]
+    latch = latches.get(code)
+    if latch:
+        if latch.on:
+            latch.on = value > latch.release
+        else:
+            latch.on = value >= latch.press
+        value = TRIGGER_MAX if latch.on else 0
+    return value
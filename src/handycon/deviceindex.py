@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import os
+
+SYS_INPUT = "/sys/class/input"
+DEV_INPUT = "/dev/input"
+
+# USB interfaces are at most this many levels above an input device, which may
+# sit under a HID device.
+USB_DEPTH = 4
+
+
+# What sysfs reports about one event node. vendor and product are the USB (or
+# other bus) IDs as integers and interface the USB interface number, or -1 off
+# USB. removable is set for devices on ports the firmware marks as removable.
+# role is the role the device matched in the index, if any.
+class DeviceInfo:
+    __slots__ = (
+        "event",
+        "path",
+        "name",
+        "phys",
+        "vendor",
+        "product",
+        "interface",
+        "removable",
+        "role",
+    )
+
+    def __init__(
+        self, event, path, name, phys, vendor, product, interface=-1, removable=False
+    ):
+        self.event = event
+        self.path = path
+        self.name = name
+        self.phys = phys
+        self.vendor = vendor
+        self.product = product
+        self.interface = interface
+        self.removable = removable
+        self.role = None
+
+    def __repr__(self):
+        return (
+            f"DeviceInfo({self.event}, {self.name!r}, {self.phys!r}, "
+            f"{self.vendor:04x}:{self.product:04x})"
+        )
+
+
+# Indexes the input event nodes by (name, phys) and by (vendor, product) from
+# their sysfs attributes, so finding a device opens nothing but the node that is
+# used. refresh() only reads the attributes of nodes added since the last scan
+# and add() and remove() keep the index current from hotplug events.
+#
+# Roles, such as "controller", match devices by USB vendor, product, interface
+# number and name, which don't change when firmware updates renumber the buses
+# in phys. Every candidate of a role is a key of one dict, so a node is matched
+# with one lookup as it is added, however many candidates a role lists.
+class DeviceIndex:
+    def __init__(self, sys_input=SYS_INPUT, dev_input=DEV_INPUT):
+        self.sys_input = sys_input
+        self.dev_input = dev_input
+        self.devices = {}  # Event node name -> DeviceInfo
+        self.by_address = {}  # (name, phys) -> [DeviceInfo]
+        self.by_id = {}  # (vendor, product) -> [DeviceInfo]
+        self.roles = {}  # (vendor, product, interface, name) -> role
+        self.by_role = {}  # role -> [DeviceInfo]
+
+        # Statistics
+        self.scans = 0
+        self.reads = 0
+
+    def __len__(self):
+        return len(self.devices)
+
+    def refresh(self):
+        self.scans += 1
+        try:
+            events = {
+                entry
+                for entry in os.listdir(self.sys_input)
+                if entry.startswith("event")
+            }
+        except FileNotFoundError:
+            events = set()
+        for event in self.devices.keys() - events:
+            self.remove(event)
+        for event in sorted(events - self.devices.keys(), key=event_number):
+            self.add(event)
+
+    # Reads the attributes of an event node into the index. Nodes that vanish
+    # while being read are skipped.
+    def add(self, event):
+        device = os.path.join(self.sys_input, event, "device")
+        try:
+            name = read_attribute(device, "name")
+            phys = read_attribute(device, "phys")
+            vendor = int(read_attribute(device, "id/vendor"), 16)
+            product = int(read_attribute(device, "id/product"), 16)
+        except (OSError, ValueError):
+            return None
+        interface, removable = usb_interface(device)
+        self.reads += 1
+        self.remove(event)
+        info = DeviceInfo(
+            event,
+            os.path.join(self.dev_input, event),
+            name,
+            phys,
+            vendor,
+            product,
+            interface,
+            removable,
+        )
+        self.devices[event] = info
+        insert(self.by_address.setdefault((name, phys), []), info)
+        insert(self.by_id.setdefault((vendor, product), []), info)
+        self.match(info)
+        return info
+
+    def remove(self, event):
+        info = self.devices.pop(event, None)
+        if not info:
+            return
+        tables = [
+            (self.by_address, (info.name, info.phys)),
+            (self.by_id, (info.vendor, info.product)),
+        ]
+        if info.role:
+            tables.append((self.by_role, info.role))
+        for table, key in tables:
+            infos = table[key]
+            infos.remove(info)
+            if not infos:
+                del table[key]
+
+    # Returns the first event node with the name and phys, or None.
+    def find(self, name, phys):
+        infos = self.by_address.get((name, phys))
+        return infos[0] if infos else None
+
+    # Returns every event node with the vendor and product IDs.
+    def find_id(self, vendor, product):
+        return list(self.by_id.get((vendor, product), ()))
+
+    # Sets the (vendor, product, interface) candidates of a role, for devices
+    # with the name. Devices on removable ports never match, so a pad plugged
+    # into the handheld isn't taken for its own.
+    def set_role(self, role, name, candidates):
+        self.roles = {key: other for key, other in self.roles.items() if other != role}
+        for vendor, product, interface in candidates:
+            self.roles[(vendor, product, interface, name)] = role
+        for info in self.by_role.pop(role, ()):
+            info.role = None
+        for info in self.devices.values():
+            if not info.role:
+                self.match(info)
+
+    def match(self, info):
+        if info.removable:
+            return
+        role = self.roles.get((info.vendor, info.product, info.interface, info.name))
+        if role:
+            info.role = role
+            insert(self.by_role.setdefault(role, []), info)
+
+    # Returns the event node that matched the role, or None. Where several did,
+    # the one with phys is preferred.
+    def find_role(self, role, phys=""):
+        infos = self.by_role.get(role, ())
+        for info in infos:
+            if info.phys == phys:
+                return info
+        return infos[0] if infos else None
+
+
+def read_attribute(device, name):
+    with open(os.path.join(device, name)) as attribute:
+        return attribute.read().rstrip("\n")
+
+
+# Returns the number of the USB interface above an input device and whether its
+# port is removable, or (-1, False) for devices that aren't on USB.
+def usb_interface(device):
+    path = os.path.realpath(device)
+    for _ in range(USB_DEPTH):
+        path = os.path.dirname(path)
+        try:
+            interface = int(read_attribute(path, "bInterfaceNumber"), 16)
+        except (OSError, ValueError):
+            continue
+        try:
+            removable = read_attribute(os.path.dirname(path), "removable")
+        except OSError:
+            removable = ""
+        return interface, removable == "removable"
+    return -1, False
+
+
+def event_number(event):
+    return int(event[5:]) if event[5:].isdigit() else -1
+
+
+# Keeps lists in event node order so lookups don't depend on scan order.
+def insert(infos, info):
+    number = event_number(info.event)
+    for index, other in enumerate(infos):
+        if event_number(other.event) > number:
+            infos.insert(index, info)
+            return
+    infos.append(info)
@@ -5,94 +5,67 @@
 # Python Modules
 import asyncio
 import os
+import re
 import traceback
 
 # Local modules
-import handycon.handhelds.ally_gen1 as ally_gen1
-import handycon.handhelds.anb_gen1 as anb_gen1
-import handycon.handhelds.aok_gen1 as aok_gen1
-import handycon.handhelds.aok_gen2 as aok_gen2
-import handycon.handhelds.aya_gen1 as aya_gen1
-import handycon.handhelds.aya_gen2 as aya_gen2
-import handycon.handhelds.aya_gen3 as aya_gen3
-import handycon.handhelds.aya_gen4 as aya_gen4
-import handycon.handhelds.aya_gen5 as aya_gen5
-import handycon.handhelds.aya_gen6 as aya_gen6
-import handycon.handhelds.aya_gen7 as aya_gen7
-import handycon.handhelds.aya_gen8 as aya_gen8
-import handycon.handhelds.aya_gen9 as aya_gen9
-import handycon.handhelds.aya_gen10 as aya_gen10
-import handycon.handhelds.ayn_gen1 as ayn_gen1
-import handycon.handhelds.ayn_gen2 as ayn_gen2
-import handycon.handhelds.ayn_gen3 as ayn_gen3
-import handycon.handhelds.go_gen1 as go_gen1
-import handycon.handhelds.gpd_gen1 as gpd_gen1
-import handycon.handhelds.gpd_gen2 as gpd_gen2
-import handycon.handhelds.gpd_gen3 as gpd_gen3
-import handycon.handhelds.gpd_gen4 as gpd_gen4
-import handycon.handhelds.oxp_gen1 as oxp_gen1
-import handycon.handhelds.oxp_gen2 as oxp_gen2
-import handycon.handhelds.oxp_gen3 as oxp_gen3
-import handycon.handhelds.oxp_gen4 as oxp_gen4
-import handycon.handhelds.oxp_gen5 as oxp_gen5
-import handycon.handhelds.oxp_gen6 as oxp_gen6
-import handycon.handhelds.oxp_gen7 as oxp_gen7
+from .actions import INSTANT_ACTIONS, QUEUED_ACTIONS, InputSource, events
 from .constants import *
+from . import curves
+from .keystate import KeyState
+from .latency import LatencyHistogram
+from .rawinput import EVENT_SIZE, RawReader
+from .reactor import Reactor
+from .realtime import PassthroughThread
+from . import linux
+from . import tracing
 
 # Partial imports
-from evdev import ecodes as e, ff, InputDevice, InputEvent, list_devices, UInput
+from collections import deque
+from evdev import ecodes as e, ff, InputDevice, InputEvent, UInput
 from pathlib import Path
 from shutil import move
-from time import sleep
+from time import monotonic_ns
 
 handycon = None
 
+XPAD_360_NAME = "Microsoft X-Box 360 pad"
+XPAD_360_ID = (0x045E, 0x028E)
+USB_PHYS = re.compile(r"usb-.*/input(\d+)$")
+
 
 def set_handycon(handheld_controller):
     global handycon
     handycon = handheld_controller
 
 
+# The get functions grab their device if it is there and return whether they
+# did, without waiting for it. Scan and grab errors are raised to discover() or
+# try_attach(), which try again later.
 def get_controller():
     global handycon
 
     # Identify system input event devices.
     handycon.logger.debug(f"Attempting to grab {handycon.GAMEPAD_NAME}.")
-    try:
-        devices_original = [InputDevice(path) for path in list_devices()]
-
-    except Exception as err:
-        handycon.logger.error("Error when scanning event devices. Restarting scan.")
-        handycon.logger.error(traceback.format_exc())
-        sleep(DETECT_DELAY)
+    device = open_device(handycon.GAMEPAD_NAME, handycon.GAMEPAD_ADDRESS, "controller")
+    if not device:
+        handycon.logger.warn("Controller device not yet found. Waiting for it.")
         return False
 
     # Grab the built-in devices. This will give us exclusive acces to the devices and their capabilities.
-    for device in devices_original:
-        if (
-            device.name == handycon.GAMEPAD_NAME
-            and device.phys == handycon.GAMEPAD_ADDRESS
-        ):
-            handycon.controller_path = device.path
-            handycon.controller_device = InputDevice(handycon.controller_path)
-            if handycon.CAPTURE_CONTROLLER:
-                handycon.controller_device.grab()
-                handycon.controller_event = Path(handycon.controller_path).name
-                move(
-                    handycon.controller_path, str(HIDE_PATH / handycon.controller_event)
-                )
-            break
-
-    # Sometimes the service loads before all input devices have full initialized. Try a few times.
-    if not handycon.controller_device:
-        handycon.logger.warn("Controller device not yet found. Restarting scan.")
-        sleep(DETECT_DELAY)
-        return False
-    else:
-        handycon.logger.info(
-            f"Found {handycon.controller_device.name}. Capturing input data."
-        )
-        return True
+    try:
+        if handycon.CAPTURE_CONTROLLER:
+            device.grab()
+            handycon.controller_latency = measure_latency(device, "Controller")
+            handycon.controller_event = Path(device.path).name
+            move(device.path, str(HIDE_PATH / handycon.controller_event))
+    except Exception:
+        close_device(device)
+        raise
+    handycon.controller_path = device.path
+    handycon.controller_device = device
+    handycon.logger.info(f"Found {device.name}. Capturing input data.")
+    return True
 
 
 def get_keyboard():
@@ -100,79 +73,52 @@ def get_keyboard():
 
     # Identify system input event devices.
     handycon.logger.debug(f"Attempting to grab {handycon.KEYBOARD_NAME}.")
-    try:
-        devices_original = [InputDevice(path) for path in list_devices()]
-    except Exception as err:
-        handycon.logger.error("Error when scanning event devices. Restarting scan.")
-        handycon.logger.error(traceback.format_exc())
-        sleep(DETECT_DELAY)
+    device = open_device(handycon.KEYBOARD_NAME, handycon.KEYBOARD_ADDRESS, "keyboard")
+    if not device:
+        handycon.logger.warn("Keyboard device not yet found. Waiting for it.")
         return False
+
     # Grab the built-in devices. This will give us exclusive acces to the devices and their capabilities.
-    for device in devices_original:
-        handycon.logger.debug(f"{device.name}, {device.phys}")
-        if (
-            device.name == handycon.KEYBOARD_NAME
-            and device.phys == handycon.KEYBOARD_ADDRESS
-        ):
-            handycon.keyboard_path = device.path
-            handycon.keyboard_device = InputDevice(handycon.keyboard_path)
-            if handycon.CAPTURE_KEYBOARD:
-                handycon.keyboard_device.grab()
-                handycon.keyboard_event = Path(handycon.keyboard_path).name
-                move(handycon.keyboard_path, str(HIDE_PATH / handycon.keyboard_event))
-            break
-
-    # Sometimes the service loads before all input devices have full initialized. Try a few times.
-    if not handycon.keyboard_device:
-        handycon.logger.warn("Keyboard device not yet found. Restarting scan.")
-        sleep(DETECT_DELAY)
-        return False
-    else:
-        handycon.logger.info(
-            f"Found {handycon.keyboard_device.name}. Capturing input data."
-        )
-        return True
+    try:
+        if handycon.CAPTURE_KEYBOARD:
+            device.grab()
+            handycon.keyboard_latency = measure_latency(device, "Keyboard")
+            handycon.keyboard_event = Path(device.path).name
+            move(device.path, str(HIDE_PATH / handycon.keyboard_event))
+    except Exception:
+        close_device(device)
+        raise
+    handycon.keyboard_path = device.path
+    handycon.keyboard_device = device
+    handycon.logger.info(f"Found {device.name}. Capturing input data.")
+    return True
 
 
 def get_keyboard_2():
     global handycon
 
     handycon.logger.debug(f"Attempting to grab {handycon.KEYBOARD_2_NAME}.")
-    try:
-        devices_original = [InputDevice(path) for path in list_devices()]
-    except Exception as err:
-        handycon.logger.error("Error when scanning event devices. Restarting scan.")
-        handycon.logger.error(traceback.format_exc())
-        sleep(DETECT_DELAY)
+    device = open_device(
+        handycon.KEYBOARD_2_NAME, handycon.KEYBOARD_2_ADDRESS, "keyboard_2"
+    )
+    if not device:
+        handycon.logger.warn("Keyboard device 2 not yet found. Waiting for it.")
         return False
 
     # Grab the built-in devices. This will give us exclusive acces to the devices and their capabilities.
-    for device in devices_original:
-        handycon.logger.debug(f"{device.name}, {device.phys}")
-        if (
-            device.name == handycon.KEYBOARD_2_NAME
-            and device.phys == handycon.KEYBOARD_2_ADDRESS
-        ):
-            handycon.keyboard_2_path = device.path
-            handycon.keyboard_2_device = InputDevice(handycon.keyboard_2_path)
-            if handycon.CAPTURE_KEYBOARD:
-                handycon.keyboard_2_device.grab()
-                handycon.keyboard_2_event = Path(handycon.keyboard_2_path).name
-                move(
-                    handycon.keyboard_2_path, str(HIDE_PATH / handycon.keyboard_2_event)
-                )
-            break
-
-    # Sometimes the service loads before all input devices have full initialized. Try a few times.
-    if not handycon.keyboard_2_device:
-        handycon.logger.warn("Keyboard device 2 not yet found. Restarting scan.")
-        sleep(DETECT_DELAY)
-        return False
-    else:
-        handycon.logger.info(
-            f"Found {handycon.keyboard_2_device.name}. Capturing input data."
-        )
-        return True
+    try:
+        if handycon.CAPTURE_KEYBOARD:
+            device.grab()
+            handycon.keyboard_2_latency = measure_latency(device, "Keyboard 2")
+            handycon.keyboard_2_event = Path(device.path).name
+            move(device.path, str(HIDE_PATH / handycon.keyboard_2_event))
+    except Exception:
+        close_device(device)
+        raise
+    handycon.keyboard_2_path = device.path
+    handycon.keyboard_2_device = device
+    handycon.logger.info(f"Found {device.name}. Capturing input data.")
+    return True
 
 
 def get_powerkey():
@@ -180,45 +126,22 @@ def get_powerkey():
 
     handycon.logger.debug(f"Attempting to grab power buttons.")
     # Identify system input event devices.
-    try:
-        devices_original = [InputDevice(path) for path in list_devices()]
-    # Some funky stuff happens sometimes when booting. Give it another shot.
-    except Exception as err:
-        handycon.logger.error("Error when scanning event devices. Restarting scan.")
-        handycon.logger.error(traceback.format_exc())
-        sleep(DETECT_DELAY)
-        return False
-
-    # Grab the built-in devices. This will give us exclusive acces to the devices and their capabilities.
-    for device in devices_original:
-        # Power Button
-        if (
-            device.name == "Power Button"
-            and device.phys == handycon.POWER_BUTTON_PRIMARY
-            and not handycon.power_device
-        ):
-            handycon.power_device = device
+    if not handycon.power_device:
+        handycon.power_device = open_power_device(handycon.POWER_BUTTON_PRIMARY)
+        if handycon.power_device:
             handycon.logger.debug(f"found power device {handycon.power_device.phys}")
-            if handycon.CAPTURE_POWER:
-                handycon.power_device.grab()
-
-        # Some devices have an extra power input device corresponding to the same
-        # physical button that needs to be grabbed.
-        if (
-            device.name == "Power Button"
-            and device.phys == handycon.POWER_BUTTON_SECONDARY
-            and not handycon.power_device_2
-        ):
-            handycon.power_device_2 = device
+
+    # Some devices have an extra power input device corresponding to the same
+    # physical button that needs to be grabbed.
+    if not handycon.power_device_2:
+        handycon.power_device_2 = open_power_device(handycon.POWER_BUTTON_SECONDARY)
+        if handycon.power_device_2:
             handycon.logger.debug(
                 f"found alternate power device {handycon.power_device_2.phys}"
             )
-            if handycon.CAPTURE_POWER:
-                handycon.power_device_2.grab()
 
     if not handycon.power_device and not handycon.power_device_2:
-        handycon.logger.warn("No Power Button found. Restarting scan.")
-        sleep(DETECT_DELAY)
+        handycon.logger.warn("No Power Button found. Waiting for it.")
         return False
     else:
         if handycon.power_device:
@@ -232,6 +155,137 @@ def get_powerkey():
         return True
 
 
+def open_power_device(phys):
+    global handycon
+
+    device = open_device("Power Button", phys)
+    if device and handycon.CAPTURE_POWER:
+        try:
+            device.grab()
+        except Exception:
+            close_device(device)
+            raise
+    return device
+
+
+# Returns once get() has grabbed its device, for the capture loops of the
+# asyncio backend. While the device is missing this waits for a device that
+# matches one of the keys, its index role or (name, phys) address, to appear and
+# a failed scan is tried again after DETECT_DELAY. Neither blocks the loop, so
+# other devices keep flowing.
+async def discover(get, *keys):
+    global handycon
+
+    while True:
+        try:
+            if get():
+                return
+        # Some funky stuff happens sometimes when booting. Give it another shot.
+        except Exception as err:
+            handycon.logger.error("Error when scanning event devices. Restarting scan.")
+            handycon.logger.error(traceback.format_exc())
+            await asyncio.sleep(DETECT_DELAY)
+            continue
+        await handycon.hotplug.wait(*keys)
+
+
+# Registers the USB candidates of each device with the device index, so devices
+# are still found when firmware updates renumber the buses in phys. Profiles
+# list (vendor, product, interface) candidates in GAMEPAD_USB and the like.
+# Without them the candidates are derived from the profile's phys.
+def set_device_roles():
+    global handycon
+
+    index = handycon.device_index
+    index.refresh()
+    for role, name, candidates, phys in (
+        (
+            "controller",
+            handycon.GAMEPAD_NAME,
+            handycon.GAMEPAD_USB,
+            handycon.GAMEPAD_ADDRESS,
+        ),
+        (
+            "keyboard",
+            handycon.KEYBOARD_NAME,
+            handycon.KEYBOARD_USB,
+            handycon.KEYBOARD_ADDRESS,
+        ),
+        (
+            "keyboard_2",
+            handycon.KEYBOARD_2_NAME,
+            handycon.KEYBOARD_2_USB,
+            handycon.KEYBOARD_2_ADDRESS,
+        ),
+    ):
+        index.set_role(role, name, candidates or usb_candidates(name, phys))
+
+
+# The interface is the number a USB phys ends with. xpad only uses its 360 pad
+# name for the Microsoft IDs, which the controllers of many handhelds report.
+# Other devices take the IDs of the node at phys, if it is there.
+def usb_candidates(name, phys):
+    match = USB_PHYS.match(phys)
+    if not match:
+        return []
+    interface = int(match.group(1))
+    if name == XPAD_360_NAME:
+        return [(*XPAD_360_ID, interface)]
+    info = handycon.device_index.find(name, phys)
+    if info and info.interface == interface:
+        return [(info.vendor, info.product, interface)]
+    return []
+
+
+# Opens the event node of the device that matched the role in the shared
+# deviceindex.DeviceIndex, or else the device with the name and phys, or returns
+# None if it isn't there. Only that node is opened, so retries don't open every
+# input device.
+def open_device(name, phys, role=None):
+    global handycon
+
+    index = handycon.device_index
+    index.refresh()
+    info = index.find_role(role, phys) if role else None
+    if not info and phys:
+        info = index.find(name, phys)
+    if not info:
+        return None
+    try:
+        return InputDevice(info.path)
+    except FileNotFoundError:
+        # The node went away or is still hidden from a previous grab.
+        return None
+
+
+# Closes a device that is being released, so its fd doesn't outlive it.
+def close_device(device):
+    if device:
+        try:
+            device.close()
+        except OSError:
+            pass
+
+
+# Switches a grabbed device's event timestamps to CLOCK_MONOTONIC, the clock of
+# monotonic_ns(), so the time from the kernel timestamp to the write to the
+# virtual device can be measured. Returns the histogram of the device's role, kept
+# across grabs, or None if latency isn't measured.
+def measure_latency(device, role):
+    global handycon
+
+    if not handycon.measure_latency:
+        return None
+    try:
+        linux.set_clock_id(device.fd, linux.CLOCK_MONOTONIC)
+    except OSError as err:
+        handycon.logger.warn(f"{err} | Unable to measure latency of {device.name}.")
+        return None
+    if role not in handycon.latency:
+        handycon.latency[role] = LatencyHistogram(role)
+    return handycon.latency[role]
+
+
 async def do_rumble(button=0, interval=10, length=1000, delay=0):
     global handycon
 
@@ -253,154 +307,136 @@ async def do_rumble(button=0, interval=10, length=1000, delay=0):
     # Upload and transmit the effect.
     effect_id = handycon.controller_device.upload_effect(effect)
     handycon.controller_device.write(e.EV_FF, effect_id, 1)
-    await asyncio.sleep(interval / 1000)
+    await handycon.timers.sleep(interval / 1000)
     handycon.controller_device.erase_effect(effect_id)
 
 
+# Traces a keyboard event with the state chord processing will see.
+def trace_seed_event(seed_event, active_keys, source):
+    tracing.record(
+        tracing.SEED_EVENT,
+        seed_event.type,
+        seed_event.code,
+        seed_event.value,
+        active_keys.bit_count(),
+        len(source.event_queue),
+    )
+
+
+# Forgets a device that stopped responding and restores its event node.
+def release_controller():
+    if handycon.turbo:
+        handycon.turbo.reset()
+    if handycon.coalescer:
+        handycon.coalescer.reset()
+    remove_device(HIDE_PATH, handycon.controller_event)
+    close_device(handycon.controller_device)
+    handycon.controller_device = None
+    handycon.controller_event = None
+    handycon.controller_latency = None
+    handycon.controller_path = None
+
+
+def release_keyboard():
+    remove_device(HIDE_PATH, handycon.keyboard_event)
+    close_device(handycon.keyboard_device)
+    handycon.keyboard_device = None
+    handycon.keyboard_event = None
+    handycon.keyboard_latency = None
+    handycon.keyboard_path = None
+
+
+def release_keyboard_2():
+    remove_device(HIDE_PATH, handycon.keyboard_2_event)
+    close_device(handycon.keyboard_2_device)
+    handycon.keyboard_2_device = None
+    handycon.keyboard_2_event = None
+    handycon.keyboard_2_latency = None
+    handycon.keyboard_2_path = None
+
+
 # Captures keyboard events and translates them to virtual device events.
 async def capture_keyboard_events():
     global handycon
 
+    process_event = handycon.handheld.process_event
+
     # Capture keyboard events and translate them to mapped events.
     while handycon.running:
         if handycon.keyboard_device:
             try:
-                async for seed_event in handycon.keyboard_device.async_read_loop():
-                    # Loop variables
-                    active_keys = handycon.keyboard_device.active_keys()
-
-                    # Debugging variables
-                    handycon.logger.debug(
-                        f"Seed Value: {seed_event.value}, Seed Code: {seed_event.code}, Seed Type: {seed_event.type}."
-                    )
-                    if active_keys != []:
-                        handycon.logger.debug(f"Active Keys: {active_keys}")
-                    else:
-                        handycon.logger.debug("No active keys")
-                    if handycon.event_queue != []:
-                        handycon.logger.debug(f"Queued events: {handycon.event_queue}")
-                    else:
-                        handycon.logger.debug("No active events.")
-
-                    # Capture keyboard events and translate them to mapped events.
-                    match handycon.system_type:
-                        case "ALY_GEN1":
-                            await ally_gen1.process_event(seed_event, active_keys)
-                        case "ANB_GEN1":
-                            await anb_gen1.process_event(seed_event, active_keys)
-                        case "AOK_GEN1":
-                            await aok_gen1.process_event(seed_event, active_keys)
-                        case "AOK_GEN2":
-                            await aok_gen2.process_event(seed_event, active_keys)
-                        case "AYA_GEN1":
-                            await aya_gen1.process_event(seed_event, active_keys)
-                        case "AYA_GEN2":
-                            await aya_gen2.process_event(seed_event, active_keys)
-                        case "AYA_GEN3":
-                            await aya_gen3.process_event(seed_event, active_keys)
-                        case "AYA_GEN4":
-                            await aya_gen4.process_event(seed_event, active_keys)
-                        case "AYA_GEN5":
-                            await aya_gen5.process_event(seed_event, active_keys)
-                        case "AYA_GEN6":
-                            await aya_gen6.process_event(seed_event, active_keys)
-                        case "AYA_GEN7":
-                            await aya_gen7.process_event(seed_event, active_keys)
-                        case "AYA_GEN8":
-                            await aya_gen8.process_event(seed_event, active_keys)
-                        case "AYA_GEN9":
-                            await aya_gen9.process_event(seed_event, active_keys)
-                        case "AYA_GEN10":
-                            await aya_gen10.process_event(seed_event, active_keys)
-                        case "AYN_GEN1":
-                            await ayn_gen1.process_event(seed_event, active_keys)
-                        case "AYN_GEN2":
-                            await ayn_gen2.process_event(seed_event, active_keys)
-                        case "AYN_GEN3":
-                            await ayn_gen3.process_event(seed_event, active_keys)
-                        case "GO_GEN1":
-                            await go_gen1.process_event(seed_event, active_keys)
-                        case "GPD_GEN1":
-                            await gpd_gen1.process_event(seed_event, active_keys)
-                        case "GPD_GEN2":
-                            await gpd_gen2.process_event(seed_event, active_keys)
-                        case "GPD_GEN3":
-                            await gpd_gen3.process_event(seed_event, active_keys)
-                        case "GPD_GEN4":
-                            await gpd_gen4.process_event(seed_event, active_keys)
-                        case "OXP_GEN1":
-                            await oxp_gen1.process_event(seed_event, active_keys)
-                        case "OXP_GEN2":
-                            await oxp_gen2.process_event(seed_event, active_keys)
-                        case "OXP_GEN3":
-                            await oxp_gen3.process_event(seed_event, active_keys)
-                        case "OXP_GEN4":
-                            await oxp_gen4.process_event(seed_event, active_keys)
-                        case "OXP_GEN5":
-                            await oxp_gen5.process_event(seed_event, active_keys)
-                        case "OXP_GEN6":
-                            await oxp_gen6.process_event(seed_event, active_keys)
-                        case "OXP_GEN7":
-                            await oxp_gen7.process_event(seed_event, active_keys)
+                key_state = KeyState(handycon.keyboard_device)
+                source = InputSource(handycon.keyboard_device.name)
+                source.latency = handycon.keyboard_latency
+                reader = make_reader(handycon.keyboard_device)
+                while True:
+                    # Track held keys from the whole batch, the same state the
+                    # kernel would report once the batch has been read.
+                    events = await read_events(handycon.keyboard_device, reader)
+                    active_keys = key_state.update(events)
+
+                    for seed_event in events:
+                        if tracing.enabled:
+                            trace_seed_event(seed_event, active_keys, source)
+
+                        # Capture keyboard events and translate them to mapped events.
+                        await process_event(seed_event, active_keys, source)
 
             except Exception as err:
                 handycon.logger.error(
                     f"{err} | Error reading events from {handycon.keyboard_device.name}"
                 )
                 handycon.logger.error(traceback.format_exc())
-                remove_device(HIDE_PATH, handycon.keyboard_event)
-                handycon.keyboard_device = None
-                handycon.keyboard_event = None
-                handycon.keyboard_path = None
+                release_keyboard()
         else:
             handycon.logger.info("Attempting to grab keyboard device...")
-            get_keyboard()
-            await asyncio.sleep(DETECT_DELAY)
+            await discover(
+                get_keyboard,
+                "keyboard",
+                (handycon.KEYBOARD_NAME, handycon.KEYBOARD_ADDRESS),
+            )
 
 
 # Captures keyboard events and translates them to virtual device events.
 async def capture_keyboard_2_events():
     global handycon
 
+    process_event = handycon.handheld.process_event
+
     # Capture keyboard events and translate them to mapped events.
     while handycon.running:
         if handycon.keyboard_2_device:
             try:
-                async for seed_event_2 in handycon.keyboard_2_device.async_read_loop():
-                    # Loop variables
-                    active_keys_2 = handycon.keyboard_2_device.active_keys()
-
-                    # Debugging variables
-                    handycon.logger.debug(
-                        f"Seed Value: {seed_event_2.value}, Seed Code: {seed_event_2.code}, Seed Type: {seed_event_2.type}."
-                    )
-                    if active_keys_2 != []:
-                        handycon.logger.debug(f"Active Keys: {active_keys_2}")
-                    else:
-                        handycon.logger.debug("No active keys")
-                    if handycon.event_queue != []:
-                        handycon.logger.debug(f"Queued events: {handycon.event_queue}")
-                    else:
-                        handycon.logger.debug("No active events.")
-
-                    # Capture keyboard events and translate them to mapped events.
-                    match handycon.system_type:
-                        case "ALY_GEN1":
-                            await ally_gen1.process_event(seed_event_2, active_keys_2)
+                key_state = KeyState(handycon.keyboard_2_device)
+                source = InputSource(handycon.keyboard_2_device.name)
+                source.latency = handycon.keyboard_2_latency
+                reader = make_reader(handycon.keyboard_2_device)
+                while True:
+                    # Track held keys from the whole batch, the same state the
+                    # kernel would report once the batch has been read.
+                    events = await read_events(handycon.keyboard_2_device, reader)
+                    active_keys_2 = key_state.update(events)
+
+                    for seed_event_2 in events:
+                        if tracing.enabled:
+                            trace_seed_event(seed_event_2, active_keys_2, source)
+
+                        # Capture keyboard events and translate them to mapped events.
+                        await process_event(seed_event_2, active_keys_2, source)
 
             except Exception as err:
                 handycon.logger.error(
                     f"{err} | Error reading events from {handycon.keyboard_2_device.name}"
                 )
                 handycon.logger.error(traceback.format_exc())
-                remove_device(HIDE_PATH, handycon.keyboard_2_event)
-                handycon.keyboard_2_device = None
-                handycon.keyboard_2_event = None
-                handycon.keyboard_2_path = None
+                release_keyboard_2()
         else:
             handycon.logger.info("Attempting to grab keyboard device 2...")
-            get_keyboard_2()
-            await asyncio.sleep(DETECT_DELAY)
+            await discover(
+                get_keyboard_2,
+                "keyboard_2",
+                (handycon.KEYBOARD_2_NAME, handycon.KEYBOARD_2_ADDRESS),
+            )
 
 
 async def capture_controller_events():
@@ -410,26 +446,202 @@ async def capture_controller_events():
     while handycon.running:
         if handycon.controller_device:
             try:
-                async for event in handycon.controller_device.async_read_loop():
-                    # Block FF events, or get infinite recursion. Up to you I guess...
-                    if event.type in [e.EV_FF, e.EV_UINPUT]:
-                        continue
-
-                    # Output the event.
-                    emit_event(event)
+                # The records are passed through as read unless the evdev
+                # backend decodes them. Turbo and stick coalescing keep the
+                # passthrough on the loop, where their timers run.
+                if handycon.read_backend != "raw":
+                    await forward_controller_events(handycon.controller_device)
+                elif (
+                    handycon.realtime_thread
+                    and not handycon.turbo
+                    and not handycon.coalescer
+                ):
+                    await forward_controller_thread(handycon.controller_device)
+                else:
+                    await forward_controller_passthrough(
+                        RawReader(handycon.controller_device.fd)
+                    )
             except Exception as err:
                 handycon.logger.error(
                     f"{err} | Error reading events from {handycon.controller_device.name}."
                 )
                 handycon.logger.error(traceback.format_exc())
-                remove_device(HIDE_PATH, handycon.controller_event)
-                handycon.controller_device = None
-                handycon.controller_event = None
-                handycon.controller_path = None
+                release_controller()
         else:
             handycon.logger.info("Attempting to grab controller device...")
-            get_controller()
-            await asyncio.sleep(DETECT_DELAY)
+            await discover(
+                get_controller,
+                "controller",
+                (handycon.GAMEPAD_NAME, handycon.GAMEPAD_ADDRESS),
+            )
+
+
+# Forwards controller events read through evdev one frame at a time.
+async def forward_controller_events(device):
+    frame = []
+    while True:
+        forward_events(frame, await device.async_read())
+
+
+# Buffers decoded events into frame and emits it at the source's SYN_REPORT so
+# it is forwarded atomically.
+def forward_events(frame, events):
+    turbo = handycon.turbo
+    coalescer = handycon.coalescer
+    tables = handycon.axis_tables
+    latches = handycon.trigger_latches
+    remap = handycon.controller_remap
+    for event in events:
+        # Block FF events, or get infinite recursion. Up to you I guess...
+        if event.type in [e.EV_FF, e.EV_UINPUT]:
+            continue
+
+        if remap and event.type == e.EV_KEY:
+            event.code = remap[event.code]
+
+        # Turbo buttons are written by the turbo timer.
+        if turbo and event.type == e.EV_KEY and event.code in turbo.buttons:
+            turbo.update(event.code, event.value)
+            continue
+
+        if event.type == e.EV_ABS:
+            if tables or latches:
+                event.value = curves.shape(event.code, event.value, tables, latches)
+
+            # Stick motion is written by the coalescer.
+            if coalescer and event.code in coalescer.axes:
+                coalescer.latest[event.code] = event.value
+                continue
+
+        # The kernel discards incomplete frames after SYN_DROPPED, so do the same.
+        if event.type == e.EV_SYN:
+            if event.code == e.SYN_DROPPED:
+                frame.clear()
+                continue
+            if event.code == e.SYN_REPORT:
+                if frame:
+                    if coalescer and coalescer.latest:
+                        os.write(handycon.ui_device.fd, coalescer.take())
+                    frame.append(event)
+                    emit_frame(frame)
+                    frame.clear()
+                elif not coalescer:
+                    emit_frame([event])
+                continue
+        frame.append(event)
+    if coalescer:
+        coalescer.update()
+
+
+# Forwards controller events straight from the raw read buffer to the uinput fd.
+# Blocked records are dropped by compacting the buffer in place, then every
+# complete frame in the batch goes out in one write. An incomplete trailing frame
+# is moved to the front of the buffer and the next read appends to it.
+async def forward_controller_passthrough(reader):
+    global handycon
+
+    pending = 0
+    while True:
+        count = await reader.read(pending)
+        pending = forward_records(reader, pending, count)
+
+
+# Writes the complete frames among the records read so far to the uinput fd and
+# returns the number of records carried over to the next read.
+def forward_records(reader, pending, count):
+    turbo = handycon.turbo
+    coalescer = handycon.coalescer
+    tables = handycon.axis_tables
+    latches = handycon.trigger_latches
+    remap = handycon.controller_remap
+    if turbo or coalescer or tables or latches or remap:
+        taken = []
+        kept, reported, frames = reader.compact(
+            pending,
+            count,
+            turbo.buttons if turbo else None,
+            taken,
+            coalescer.axes if coalescer else None,
+            coalescer.latest if coalescer else None,
+            tables,
+            latches,
+            remap,
+        )
+    else:
+        kept, reported, frames = reader.compact(pending, count)
+    if reported:
+        # Pending stick motion goes out with the frames, ahead of them.
+        if coalescer and coalescer.latest:
+            os.writev(
+                handycon.ui_device.fd,
+                [coalescer.take(), reader.view[: reported * EVENT_SIZE]],
+            )
+        else:
+            os.write(handycon.ui_device.fd, reader.view[: reported * EVENT_SIZE])
+        if handycon.controller_latency:
+            # The first record is the oldest in the write.
+            handycon.controller_latency.record(monotonic_ns() - reader.time_ns(0))
+        handycon.frames_forwarded += frames
+        handycon.frame_events += reported
+        handycon.frame_writes += 1
+    if turbo:
+        for code, value in taken:
+            turbo.update(code, value)
+    if coalescer:
+        coalescer.update()
+    return reader.carry(reported, kept)
+
+
+# Runs the raw passthrough on a real time thread until the device goes away.
+async def forward_controller_thread(device):
+    thread = start_passthrough_thread(device)
+    try:
+        await thread.wait()
+    finally:
+        end_passthrough_thread(thread)
+
+
+def start_passthrough_thread(device):
+    global handycon
+
+    thread = PassthroughThread(
+        device.fd,
+        handycon.ui_device.fd,
+        handycon.logger,
+        handycon.realtime_priority,
+        handycon.realtime_cpus,
+        handycon.controller_latency,
+        handycon.axis_tables,
+        handycon.trigger_latches,
+        handycon.controller_remap,
+    )
+    handycon.passthrough_thread = thread
+    thread.start()
+    return thread
+
+
+# Folds the statistics of a finished passthrough thread into the totals.
+def end_passthrough_thread(thread):
+    global handycon
+
+    handycon.passthrough_thread = None
+    handycon.frames_forwarded += thread.frames_forwarded
+    handycon.frame_events += thread.frame_events
+    handycon.frame_writes += thread.frame_writes
+
+
+# Returns a raw reader for the device when the raw read backend is selected.
+def make_reader(device):
+    if handycon.read_backend == "raw":
+        return RawReader(device.fd)
+    return None
+
+
+# Reads the next batch of events from a device as InputEvent objects.
+async def read_events(device, reader):
+    if reader:
+        return reader.events(await reader.read())
+    return list(await device.async_read())
 
 
 # Captures power events and handles long or short press events.
@@ -439,42 +651,48 @@ async def capture_power_events():
     while handycon.running:
         if handycon.power_device:
             try:
-                async for event in handycon.power_device.async_read_loop():
-                    handycon.logger.debug(
-                        f"Got event: {event.type} | {event.code} | {event.value}"
+                reader = make_reader(handycon.power_device)
+                while True:
+                    handle_power_events(
+                        await read_events(handycon.power_device, reader)
                     )
-                    if event.type == e.EV_KEY and event.code == 116:  # KEY_POWER
-                        if event.value == 0:
-                            handle_power_action()
 
             except Exception as err:
                 handycon.logger.error(
                     f"{err} | Error reading events from power device."
                 )
                 handycon.logger.error(traceback.format_exc())
+                close_device(handycon.power_device)
                 handycon.power_device = None
 
         elif handycon.power_device_2 and not handycon.power_device:
             try:
-                async for event in handycon.power_device_2.async_read_loop():
-                    handycon.logger.debug(
-                        f"Got event: {event.type} | {event.code} | {event.value}"
+                reader = make_reader(handycon.power_device_2)
+                while True:
+                    handle_power_events(
+                        await read_events(handycon.power_device_2, reader)
                     )
-                    if event.type == e.EV_KEY and event.code == 116:  # KEY_POWER
-                        if event.value == 0:
-                            handle_power_action()
 
             except Exception as err:
                 handycon.logger.error(
                     f"{err} | Error reading events from power device."
                 )
                 handycon.logger.error(traceback.format_exc())
+                close_device(handycon.power_device_2)
                 handycon.power_device_2 = None
 
         else:
             handycon.logger.info("Attempting to grab controller device...")
-            get_powerkey()
-            await asyncio.sleep(DETECT_DELAY)
+            await discover(get_powerkey, *power_addresses())
+
+
+def handle_power_events(events):
+    for event in events:
+        if tracing.enabled:
+            tracing.record(tracing.POWER_EVENT, event.type, event.code, event.value)
+        if event.type == e.EV_KEY and event.code == 116:  # KEY_POWER
+            if event.value == 0:
+                handle_power_action()
 
 
 # Performs specific power actions based on user config.
@@ -516,56 +734,309 @@ async def capture_ff_events():
             await asyncio.sleep(DETECT_DELAY)
             continue
 
-        if event.type == e.EV_FF:
-            # Forward FF event to controller.
-            handycon.controller_device.write(e.EV_FF, event.code, event.value)
-            continue
+        handle_ff_event(event, ff_effect_id_set)
 
-        # Programs will submit these EV_UINPUT events to ensure the device is capable.
-        # Doing this forever doesn't seem to pose a problem, and attempting to ignore
-        # any of them causes the program to halt.
-        if event.type != e.EV_UINPUT:
-            continue
 
-        if event.code == e.UI_FF_UPLOAD:
-            # Upload to the virtual device to prevent threadlocking. This does nothing else
-            upload = handycon.ui_device.begin_upload(event.value)
-            effect = upload.effect
+# Forwards rumble from the virtual device to the controller and answers the
+# effect uploads and erases games submit.
+def handle_ff_event(event, ff_effect_id_set):
+    if event.type == e.EV_FF:
+        # Forward FF event to controller.
+        handycon.controller_device.write(e.EV_FF, event.code, event.value)
+        return
 
-            if effect.id not in ff_effect_id_set:
-                # set to -1 for kernel to allocate a new id. all other values throw an error for invalid input.
-                effect.id = -1
+    # Programs will submit these EV_UINPUT events to ensure the device is capable.
+    # Doing this forever doesn't seem to pose a problem, and attempting to ignore
+    # any of them causes the program to halt.
+    if event.type != e.EV_UINPUT:
+        return
 
-            try:
-                # Upload to the actual controller.
-                effect_id = handycon.controller_device.upload_effect(effect)
-                effect.id = effect_id
+    if event.code == e.UI_FF_UPLOAD:
+        # Upload to the virtual device to prevent threadlocking. This does nothing else
+        upload = handycon.ui_device.begin_upload(event.value)
+        effect = upload.effect
 
-                ff_effect_id_set.add(effect_id)
+        if effect.id not in ff_effect_id_set:
+            # set to -1 for kernel to allocate a new id. all other values throw an error for invalid input.
+            effect.id = -1
 
-                upload.retval = 0
-            except IOError as err:
-                handycon.logger.error(f"{err} | Error uploading effect {effect.id}.")
-                handycon.logger.error(traceback.format_exc())
-                upload.retval = -1
+        try:
+            # Upload to the actual controller.
+            effect_id = handycon.controller_device.upload_effect(effect)
+            effect.id = effect_id
 
-            handycon.ui_device.end_upload(upload)
+            ff_effect_id_set.add(effect_id)
 
-        elif event.code == e.UI_FF_ERASE:
-            erase = handycon.ui_device.begin_erase(event.value)
+            upload.retval = 0
+        except IOError as err:
+            handycon.logger.error(f"{err} | Error uploading effect {effect.id}.")
+            handycon.logger.error(traceback.format_exc())
+            upload.retval = -1
 
-            try:
-                handycon.controller_device.erase_effect(erase.effect_id)
-                ff_effect_id_set.remove(erase.effect_id)
-                erase.retval = 0
-            except IOError as err:
-                handycon.logger.error(
-                    f"{err} | Error erasing effect {erase.effect_id}."
-                )
-                handycon.logger.error(traceback.format_exc())
-                erase.retval = -1
+        handycon.ui_device.end_upload(upload)
+
+    elif event.code == e.UI_FF_ERASE:
+        erase = handycon.ui_device.begin_erase(event.value)
+
+        try:
+            handycon.controller_device.erase_effect(erase.effect_id)
+            ff_effect_id_set.remove(erase.effect_id)
+            erase.retval = 0
+        except IOError as err:
+            handycon.logger.error(f"{err} | Error erasing effect {erase.effect_id}.")
+            handycon.logger.error(traceback.format_exc())
+            erase.retval = -1
+
+        handycon.ui_device.end_erase(erase)
+
+
+# epoll backend. Every device fd is registered with one Reactor and devices that
+# are missing are attached when the hotplug monitor sees them appear.
+def start_reactor():
+    global handycon
+
+    handycon.reactor = Reactor(handycon.logger)
+    handycon.reactor.attach(handycon.loop)
+    watch_ff()
+    attach_controller()
+    attach_keyboard()
+    if has_keyboard_2():
+        attach_keyboard_2()
+    attach_power()
+
+
+# Each attach function grabs its device and registers it with the reactor, or
+# waits for the device to appear and tries again.
+def attach_controller():
+    global handycon
+
+    if not handycon.running:
+        return
+    handycon.logger.info("Attempting to grab controller device...")
+    if try_attach(
+        get_controller,
+        attach_controller,
+        "controller",
+        (handycon.GAMEPAD_NAME, handycon.GAMEPAD_ADDRESS),
+    ):
+        watch_controller(handycon.controller_device)
+
+
+def attach_keyboard():
+    global handycon
+
+    if not handycon.running:
+        return
+    handycon.logger.info("Attempting to grab keyboard device...")
+    if try_attach(
+        get_keyboard,
+        attach_keyboard,
+        "keyboard",
+        (handycon.KEYBOARD_NAME, handycon.KEYBOARD_ADDRESS),
+    ):
+        watch_keyboard(
+            handycon.keyboard_device,
+            release_keyboard,
+            attach_keyboard,
+            handycon.keyboard_latency,
+        )
+
+
+def attach_keyboard_2():
+    global handycon
+
+    if not handycon.running:
+        return
+    handycon.logger.info("Attempting to grab keyboard device 2...")
+    if try_attach(
+        get_keyboard_2,
+        attach_keyboard_2,
+        "keyboard_2",
+        (handycon.KEYBOARD_2_NAME, handycon.KEYBOARD_2_ADDRESS),
+    ):
+        watch_keyboard(
+            handycon.keyboard_2_device,
+            release_keyboard_2,
+            attach_keyboard_2,
+            handycon.keyboard_2_latency,
+        )
+
+
+# Only one power device is read at a time, the second is a fallback.
+def attach_power():
+    global handycon
+
+    if not handycon.running:
+        return
+    if not handycon.power_device and not handycon.power_device_2:
+        handycon.logger.info("Attempting to grab power device...")
+        if not try_attach(get_powerkey, attach_power, *power_addresses()):
+            return
+    if handycon.power_device:
+        if handycon.power_device.fd not in handycon.reactor:
+            watch_power(handycon.power_device, "power_device")
+    elif handycon.power_device_2:
+        if handycon.power_device_2.fd not in handycon.reactor:
+            watch_power(handycon.power_device_2, "power_device_2")
+
+
+def has_keyboard_2():
+    return handycon.KEYBOARD_2_NAME != "" and (
+        handycon.KEYBOARD_2_ADDRESS != "" or handycon.KEYBOARD_2_USB
+    )
+
+
+def power_addresses():
+    return (
+        ("Power Button", handycon.POWER_BUTTON_PRIMARY),
+        ("Power Button", handycon.POWER_BUTTON_SECONDARY),
+    )
+
+
+# Tries get() once for the attach functions of the epoll backend. If the device
+# is missing, retry() runs again when a device that matches one of the keys
+# appears, or after DETECT_DELAY if the scan failed.
+def try_attach(get, retry, *keys):
+    global handycon
+
+    try:
+        if get():
+            return True
+    except Exception as err:
+        handycon.logger.error("Error when scanning event devices. Restarting scan.")
+        handycon.logger.error(traceback.format_exc())
+        handycon.loop.call_later(DETECT_DELAY, retry)
+        return False
+    handycon.hotplug.notify(retry, *keys)
+    return False
 
-            handycon.ui_device.end_erase(erase)
+
+# Returns an error handler that releases a lost device and attaches it again.
+def device_lost(release, attach):
+    def on_error(err):
+        release()
+        attach()
+
+    return on_error
+
+
+def watch_controller(device):
+    global handycon
+
+    # The records are passed through as read, on the real time thread if one is
+    # configured. Turbo and stick coalescing run on the loop's timers, so they
+    # keep the passthrough on the loop.
+    reader = RawReader(device.fd)
+    if handycon.realtime_thread and not handycon.turbo and not handycon.coalescer:
+        thread = start_passthrough_thread(device)
+
+        def handle():
+            handycon.reactor.unregister(thread.done_fd)
+            thread.finish()
+            end_passthrough_thread(thread)
+            if thread.error:
+                raise thread.error
+
+        handycon.reactor.register(
+            thread.done_fd, handle, device_lost(release_controller, attach_controller)
+        )
+
+    else:
+        pending = 0
+
+        def handle():
+            nonlocal pending
+            count = reader.read_now(pending)
+            if count is not None:
+                pending = forward_records(reader, pending, count)
+
+        handycon.reactor.register(
+            device.fd, handle, device_lost(release_controller, attach_controller)
+        )
+
+
+# Keyboard batches are read as soon as they are ready, but chords can await
+# rumble and button delays, so they are processed in order by one task that
+# runs while batches are pending.
+def watch_keyboard(device, release, attach, latency):
+    global handycon
+
+    key_state = KeyState(device)
+    source = InputSource(device.name)
+    source.latency = latency
+    reader = RawReader(device.fd)
+    process_event = handycon.handheld.process_event
+    batches = deque()
+    task = None
+
+    async def process_batches():
+        try:
+            while batches:
+                events, active_keys = batches.popleft()
+                for seed_event in events:
+                    if tracing.enabled:
+                        trace_seed_event(seed_event, active_keys, source)
+                    await process_event(seed_event, active_keys, source)
+        except Exception as err:
+            handycon.logger.error(f"{err} | Error reading events from {device.name}")
+            handycon.logger.error(traceback.format_exc())
+            handycon.reactor.unregister(device.fd)
+            release()
+            attach()
+
+    def handle():
+        nonlocal task
+        count = reader.read_now()
+        if count is None:
+            return
+        events = reader.events(count)
+        batches.append((events, key_state.update(events)))
+        if not task or task.done():
+            task = asyncio.ensure_future(process_batches())
+
+    handycon.reactor.register(device.fd, handle, device_lost(release, attach))
+
+
+def watch_power(device, name):
+    global handycon
+
+    reader = RawReader(device.fd)
+
+    def handle():
+        count = reader.read_now()
+        if count is not None:
+            handle_power_events(reader.events(count))
+
+    def release():
+        close_device(getattr(handycon, name))
+        setattr(handycon, name, None)
+
+    handycon.reactor.register(device.fd, handle, device_lost(release, attach_power))
+
+
+def watch_ff():
+    global handycon
+
+    ff_effect_id_set = set()
+
+    def handle():
+        try:
+            events = list(handycon.ui_device.read())
+        except BlockingIOError:
+            return
+
+        # Without a controller there is nothing to forward to.
+        if handycon.controller_device is None:
+            return
+        for event in events:
+            handle_ff_event(event, ff_effect_id_set)
+
+    # The virtual device lives as long as the service, so there is nothing to
+    # grab again if it fails.
+    def on_error(err):
+        pass
+
+    handycon.reactor.register(handycon.ui_device.fd, handle, on_error)
 
 
 def restore_device(event, path):
@@ -592,30 +1063,96 @@ def remove_device(path, event):
         pass
 
 
-# Emits passed or generated events to the virtual controller.
-# This shouldn't be called directly for custom events, only to pass realtime events.
-# Use emit_now and the device's event_queue.
-
-
-async def emit_events(events: list):
-    for event in events:
-        emit_event(event)
-        # Pause between multiple events, but not after the last one in the list.
-        if event != events[len(events) - 1]:
-            await asyncio.sleep(handycon.BUTTON_DELAY)
+# Emits the events of an action BUTTON_DELAY apart without blocking. Events
+# are queued after any action still playing. If a latency histogram is passed,
+# the write of each event is recorded in it.
+async def emit_events(events: list, latency=None):
+    handycon.macros.play(events, handycon.BUTTON_DELAY, latency)
 
 
 # Emit a single event. Skips some logic checks for optimization.
 def emit_event(event):
     global handycon
-    handycon.logger.debug(f"Emitting event: {event}")
+    if tracing.enabled:
+        tracing.record(tracing.EMIT_EVENT, event.type, event.code, event.value)
     handycon.ui_device.write_event(event)
     handycon.ui_device.syn()
 
 
+# Emit a complete frame ending in its SYN_REPORT with a single write, so the
+# virtual controller receives it atomically and with one sync.
+def emit_frame(events):
+    global handycon
+    os.write(
+        handycon.ui_device.fd,
+        b"".join(
+            [
+                EVENT_STRUCT.pack(
+                    event.sec, event.usec, event.type, event.code, event.value
+                )
+                for event in events
+            ]
+        ),
+    )
+    if handycon.controller_latency:
+        event = events[0]
+        handycon.controller_latency.record(
+            monotonic_ns() - event.sec * 1_000_000_000 - event.usec * 1000
+        )
+    handycon.frames_forwarded += 1
+    handycon.frame_events += len(events)
+    handycon.frame_writes += 1
+
+
+# Logs passthrough statistics. Triggered with SIGUSR1.
+def log_stats():
+    global handycon
+    frames = handycon.frames_forwarded
+    events = handycon.frame_events
+    writes = handycon.frame_writes
+
+    # Include the live counts of a running passthrough thread.
+    thread = handycon.passthrough_thread
+    if thread:
+        frames += thread.frames_forwarded
+        events += thread.frame_events
+        writes += thread.frame_writes
+    if frames:
+        handycon.logger.info(
+            f"Controller frames forwarded: {frames}, events per frame: {events / frames:.2f}, writes per frame: {writes / frames:.2f}"
+        )
+    else:
+        handycon.logger.info("Controller frames forwarded: 0")
+    for histogram in handycon.latency.values():
+        handycon.logger.info(str(histogram))
+    if handycon.coalescer:
+        handycon.logger.info(f"Stick frames written: {handycon.coalescer.writes}")
+    if handycon.lag_monitor:
+        handycon.lag_monitor.report()
+    if handycon.hotplug:
+        handycon.logger.info(
+            f"Input uevents: {handycon.hotplug.uevents}, devices woken: {handycon.hotplug.wakeups}"
+        )
+    if handycon.reactor:
+        handycon.logger.info(
+            f"Reactor wakeups: {handycon.reactor.wakeups}, handler calls: {handycon.reactor.dispatches}"
+        )
+
+
+# Writes the hot path trace to TRACE_PATH. Triggered with SIGUSR2.
+def dump_trace():
+    global handycon
+    if not tracing.enabled:
+        handycon.logger.info("Tracing is disabled. Set trace = true under [Input].")
+        return
+    count = tracing.dump(TRACE_PATH)
+    handycon.logger.info(f"Wrote {count} trace records to {TRACE_PATH}.")
+
+
 # Generates events from an event list. Can be called directly or when looping through
-# the event queue.
-async def emit_now(seed_event, event_list, value):
+# the event queue. Passing the actions.InputSource the seed event came from
+# records the latency of the generated events.
+async def emit_now(seed_event, event_list, value, source=None):
     global handycon
 
     # Ignore malformed requests
@@ -649,7 +1186,8 @@ async def emit_now(seed_event, event_list, value):
                 handycon.logger.warn(f"{event_list[0]} not defined.")
         return
 
-    handycon.logger.debug(f"Event list: {event_list}")
+    if tracing.enabled:
+        tracing.record(tracing.EMIT_LIST, *event_list[0], value, len(event_list))
     events = []
 
     if value == 0:
@@ -665,36 +1203,32 @@ async def emit_now(seed_event, event_list, value):
             )
             events.append(new_event)
 
-    size = len(events)
-    if size > 1:
-        await emit_events(events)
-    elif size == 1:
-        emit_event(events[0])
+    if events:
+        await emit_events(events, source.latency if source else None)
 
 
-async def handle_key_down(seed_event, queued_event):
-    handycon.event_queue.append(queued_event)
-    if queued_event in INSTANT_EVENTS:
-        await handycon.emit_now(seed_event, queued_event, 1)
+async def handle_key_down(seed_event, source, action):
+    source.event_queue[action] = None
+    if action in INSTANT_ACTIONS:
+        await handycon.emit_now(seed_event, events(action), 1, source)
 
 
-async def handle_key_up(seed_event, queued_event):
-    if queued_event in INSTANT_EVENTS:
-        handycon.event_queue.remove(queued_event)
-        await handycon.emit_now(seed_event, queued_event, 0)
-    elif queued_event in QUEUED_EVENTS:
+async def handle_key_up(seed_event, source, action):
+    if action in INSTANT_ACTIONS:
+        del source.event_queue[action]
+        await handycon.emit_now(seed_event, events(action), 0, source)
+    elif action in QUEUED_ACTIONS:
         # Create list of events to fire.
         # Handle new button presses.
-        if not handycon.last_button:
-            handycon.event_queue.remove(queued_event)
-            handycon.last_button = queued_event
-            await handycon.emit_now(seed_event, queued_event, 1)
+        if source.last_button is None:
+            del source.event_queue[action]
+            source.last_button = action
+            await handycon.emit_now(seed_event, events(action), 1, source)
             return
 
         # Clean up old button presses.
-        if handycon.last_button:
-            await handycon.emit_now(seed_event, handycon.last_button, 0)
-            handycon.last_button = None
+        await handycon.emit_now(seed_event, events(source.last_button), 0, source)
+        source.last_button = None
 
 
 async def toggle_performance():
@@ -703,14 +1237,14 @@ async def toggle_performance():
     if handycon.performance_mode == "--max-performance":
         handycon.performance_mode = "--power-saving"
         await do_rumble(0, 100, 1000, 0)
-        await asyncio.sleep(FF_DELAY)
+        await handycon.timers.sleep(FF_DELAY)
         await do_rumble(0, 100, 1000, 0)
     else:
         handycon.performance_mode = "--max-performance"
         await do_rumble(0, 500, 1000, 0)
-        await asyncio.sleep(FF_DELAY)
+        await handycon.timers.sleep(FF_DELAY)
         await do_rumble(0, 75, 1000, 0)
-        await asyncio.sleep(FF_DELAY)
+        await handycon.timers.sleep(FF_DELAY)
         await do_rumble(0, 75, 1000, 0)
 
     ryzenadj_command = f"ryzenadj {handycon.performance_mode}"
@@ -0,0 +1,19 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Each module in this package supports one family of handhelds and is bound once
+# by utilities.set_handheld when the system is identified. A handheld module
+# provides:
+#
+#   init_handheld(handycon)
+#       Sets the device names, addresses, BUTTON_DELAY and capture flags on the
+#       HandheldController.
+#
+#   process_event(seed_event, active_keys, source)
+#       Coroutine called by the keyboard capture loops for every event read from
+#       the handheld's keyboard devices. active_keys is the keystate.KeyState
+#       bitmask of held keys and source is the actions.InputSource holding the
+#       device's event queue. Modules normally bind this to the process method
+#       of their chords.ChordTable.
+#
+# New handhelds only need a module here and a match in utilities.id_system.
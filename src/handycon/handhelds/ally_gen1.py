@@ -4,16 +4,13 @@
 
 from time import sleep
 
+from .. import chords
+
 handycon = None
 
 
 def init_handheld(handheld_controller):
     global handycon
-    devices = []
-    proc_dev_fd = open("/proc/bus/input/devices", "r")
-    for line in proc_dev_fd:
-        devices.append(line)
-    proc_dev_fd.close()
 
     handycon = handheld_controller
     handycon.BUTTON_DELAY = 0.2
@@ -23,6 +20,12 @@ def init_handheld(handheld_controller):
     handycon.GAMEPAD_NAME = "Microsoft X-Box 360 pad"
     handycon.KEYBOARD_NAME = "Asus Keyboard"
     handycon.KEYBOARD_2_NAME = "Asus Keyboard"
+    handycon.GAMEPAD_USB = [(0x045E, 0x028E, 0)]
+    handycon.KEYBOARD_USB = [(0x0B05, 0x1ABE, 0)]
+    handycon.KEYBOARD_2_USB = [(0x0B05, 0x1ABE, 2)]
+
+    # The bus in phys has changed with firmware updates. A device is picked by
+    # the variant that is present, or by its USB IDs alone when none is.
     GAMEPAD_ADDRESS_LIST = [
         "usb-0000:08:00.3-2/input0",
         "usb-0000:09:00.3-2/input0",
@@ -38,24 +41,27 @@ def init_handheld(handheld_controller):
         "usb-0000:09:00.3-3/input2",
         "usb-0000:0a:00.3-3/input2",
     ]
-    for line in devices:
-        for address in GAMEPAD_ADDRESS_LIST:
-            if address in line:
-                handycon.GAMEPAD_ADDRESS = address
-        for address in KEYBOARD_ADDRESS_LIST:
-            if address in line:
-                handycon.KEYBOARD_ADDRESS = address
-        for address in KEYBOARD_2_ADDRESS_LIST:
-            if address in line:
-                handycon.KEYBOARD_2_ADDRESS = address
+    proc_devices = handycon.proc_devices
+    handycon.GAMEPAD_ADDRESS = proc_devices.first_phys(GAMEPAD_ADDRESS_LIST)
+    handycon.KEYBOARD_ADDRESS = proc_devices.first_phys(KEYBOARD_ADDRESS_LIST)
+    handycon.KEYBOARD_2_ADDRESS = proc_devices.first_phys(KEYBOARD_2_ADDRESS_LIST)
 
+    handycon.device_index.refresh()
     if (
-        not handycon.GAMEPAD_ADDRESS
-        or not handycon.KEYBOARD_ADDRESS
-        or not handycon.KEYBOARD_2_ADDRESS
+        not resolved(
+            handycon.GAMEPAD_ADDRESS, handycon.GAMEPAD_NAME, handycon.GAMEPAD_USB
+        )
+        or not resolved(
+            handycon.KEYBOARD_ADDRESS, handycon.KEYBOARD_NAME, handycon.KEYBOARD_USB
+        )
+        or not resolved(
+            handycon.KEYBOARD_2_ADDRESS,
+            handycon.KEYBOARD_2_NAME,
+            handycon.KEYBOARD_2_USB,
+        )
     ):
         handycon.logger.warn(
-            "Unable to identify one or more input devices by address. Please submit a bug report with a copy of '/proc/bus/input/devices'"
+            "Unable to identify one or more input devices by address or USB ID. Please submit a bug report with a copy of '/proc/bus/input/devices'"
         )
         exit()
 
@@ -63,110 +69,41 @@ def init_handheld(handheld_controller):
     sleep(10)
 
 
-# Captures keyboard events and translates them to virtual device events.
-
-
-async def process_event(seed_event, active_keys):
-    global handycon
-
-    # Button map shortcuts for easy reference.
-    button2 = handycon.button_map["button2"]  # Default: QAM
-    button4 = handycon.button_map["button4"]  # Default: OSK
-    button5 = handycon.button_map["button5"]  # Default: BTN_MODE
-    button7 = handycon.button_map["button7"]  # Default: Toggle Performance
-    button8 = handycon.button_map["button8"]  # Default: BTN_THUMBL
-    button9 = handycon.button_map["button9"]  # Default: BTN_THUMBR
-
-    # Loop variables
-    button_on = seed_event.value
-    this_button = None
+# Returns whether a device was found by its phys or one of its USB candidates.
+def resolved(address, name, candidates):
+    if address:
+        return True
+    for vendor, product, interface in candidates:
+        for info in handycon.device_index.find_id(vendor, product):
+            if info.name == name and info.interface == interface:
+                return True
+    return False
 
-    # Handle missed keys.
-    if active_keys == [] and handycon.event_queue != []:
-        this_button = handycon.event_queue[0]
 
-    # BUTTON 2 (Default: QAM) Armory Crate Button Short Press
-    if active_keys == [148] and button_on == 1 and button2 not in handycon.event_queue:
-        handycon.event_queue.append(button2)
-    elif (
-        active_keys == []
-        and seed_event.code in [148]
-        and button_on == 0
-        and button2 in handycon.event_queue
-    ):
-        this_button = button2
-
-    # BUTTON 4 (Default: OSK) Control Center Long Press.
-    if (
-        active_keys == [29, 56, 111]
-        and button_on == 1
-        and button4 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button4)
-        await handycon.do_rumble(0, 150, 1000, 0)
-    elif (
-        active_keys == []
-        and seed_event.code in [29, 56, 111]
-        and button_on == 0
-        and button4 in handycon.event_queue
-    ):
-        this_button = button4
-
-    # BUTTON 5 (Default: Mode) Control Center Short Press.
-    if active_keys == [186] and button_on == 1 and button5 not in handycon.event_queue:
-        handycon.event_queue.append(button5)
-    elif (
-        active_keys == []
-        and seed_event.code in [186]
-        and button_on == 0
-        and button5 in handycon.event_queue
-    ):
-        this_button = button5
-
-    # BUTTON 7 (Default: Toggle Performance) Armory Crate Button Long Press
-    # This button triggers immediate down/up after holding for ~1s an F17 and then
-    # released another down/up for F18 on release. We use the F18 "KEY_UP" for release.
-    if active_keys == [187] and button_on == 1 and button7 not in handycon.event_queue:
-        await handycon.do_rumble(0, 150, 1000, 0)
-        await handycon.handle_key_down(seed_event, button7)
-    elif (
-        active_keys == []
-        and seed_event.code in [188]
-        and button_on == 0
-        and button7 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button7)
-
-    # BUTTON 11 (Default: Happy Trigger 1) Left Paddle
-    if active_keys == [184] and button_on == 1 and button8 not in handycon.event_queue:
-        await handycon.handle_key_down(seed_event, button8)
-    elif (
-        active_keys == []
-        and seed_event.code in [184]
-        and button_on == 0
-        and button8 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button8)
-
-    # BUTTON 4 (Default: Happy Trigger 2) Right Paddle
-    if active_keys == [185] and button_on == 1 and button9 not in handycon.event_queue:
-        await handycon.handle_key_down(seed_event, button9)
-    elif (
-        active_keys == []
-        and seed_event.code in [185]
-        and button_on == 0
-        and button9 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button9)
-
-    # Create list of events to fire.
-    # Handle new button presses.
-    if this_button and not handycon.last_button:
-        handycon.event_queue.remove(this_button)
-        handycon.last_button = this_button
-        await handycon.emit_now(seed_event, this_button, 1)
-
-    # Clean up old button presses.
-    elif handycon.last_button and not this_button:
-        await handycon.emit_now(seed_event, handycon.last_button, 0)
-        handycon.last_button = None
+# Captures keyboard events and translates them to virtual device events.
+CHORD_TABLE = chords.ChordTable(
+    [
+        # BUTTON 2 (Default: QAM) Armory Crate Button Short Press
+        chords.Chord("button2", press=[148], release=[148], mode=chords.QUEUE),
+        # BUTTON 4 (Default: OSK) Control Center Long Press.
+        chords.Chord(
+            "button4",
+            press=[29, 56, 111],
+            release=[29, 56, 111],
+            mode=chords.QUEUE,
+            rumble=(0, 150, 1000, 0),
+        ),
+        # BUTTON 5 (Default: Mode) Control Center Short Press.
+        chords.Chord("button5", press=[186], release=[186], mode=chords.QUEUE),
+        # BUTTON 7 (Default: Toggle Performance) Armory Crate Button Long Press
+        # This button triggers immediate down/up after holding for ~1s an F17 and then
+        # released another down/up for F18 on release. We use the F18 "KEY_UP" for release.
+        chords.Chord("button7", press=[187], release=[188], rumble=(0, 150, 1000, 0)),
+        # BUTTON 11 (Default: Happy Trigger 1) Left Paddle
+        chords.Chord("button8", press=[184], release=[184]),
+        # BUTTON 4 (Default: Happy Trigger 2) Right Paddle
+        chords.Chord("button9", press=[185], release=[185]),
+    ],
+    queued=True,
+)
+process_event = CHORD_TABLE.process
@@ -4,6 +4,8 @@
 
 from evdev import ecodes as e
 
+from .. import chords
+
 handycon = None
 
 
@@ -21,97 +23,19 @@ def init_handheld(handheld_controller):
 
 
 # Captures keyboard events and translates them to virtual device events.
-async def process_event(seed_event, active_keys):
-    global handycon
-
-    # Button map shortcuts for easy reference.
-    button1 = handycon.button_map["button1"]
-    button2 = handycon.button_map["button2"]
-    button4 = handycon.button_map["button4"]
-    button5 = handycon.button_map["button5"]
-    button6 = handycon.button_map["button6"]
-
-    # Loop variables
-    button_on = seed_event.value
-
-    # Automatically pass default keycodes we dont intend to replace.
-    if seed_event.code in [e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP]:
-        handycon.emit_event(seed_event)
-
-    # BUTTON 1: LC Button
-    if (
-        active_keys == [97, 125, 185]
-        and button_on == 1
-        and button1 not in handycon.event_queue
-    ):
-        await handycon.handle_key_down(seed_event, button1)
-    elif (
-        active_keys == []
-        and seed_event.code in [97, 125, 185]
-        and button_on == 0
-        and button1 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button1)
-
-    # BUTTON 2: AYA small Button
-    if (
-        active_keys == [32, 125]
-        and button_on == 1
-        and button2 not in handycon.event_queue
-    ):
-        await handycon.handle_key_down(seed_event, button2)
-    elif (
-        active_keys == []
-        and seed_event.code in [32, 125]
-        and button_on == 0
-        and button2 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button2)
-
-    # BUTTON 4: RC Button
-    if (
-        active_keys == [97, 125, 186]
-        and button_on == 1
-        and button4 not in handycon.event_queue
-    ):
-        await handycon.handle_key_down(seed_event, button4)
-    elif (
-        active_keys == []
-        and seed_event.code in [97, 125, 186]
-        and button_on == 0
-        and button4 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button4)
-
-    # BUTTON 5: AYAspace
-    if (
-        active_keys == [97, 125, 187]
-        and button_on == 1
-        and button5 not in handycon.event_queue
-    ):
-        await handycon.handle_key_down(seed_event, button5)
-    elif (
-        active_keys == []
-        and seed_event.code in [97, 125, 187]
-        and button_on == 0
-        and button5 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button5)
-
-    # BUTTON 6: T Button
-    if (
-        active_keys == [97, 125, 188]
-        and button_on == 1
-        and button6 not in handycon.event_queue
-    ):
-        await handycon.handle_key_down(seed_event, button6)
-    elif (
-        active_keys == []
-        and seed_event.code in [97, 125, 188]
-        and button_on == 0
-        and button6 in handycon.event_queue
-    ):
-        await handycon.handle_key_up(seed_event, button6)
-
-    if handycon.last_button:
-        await handycon.handle_key_up(seed_event, handycon.last_button)
+CHORD_TABLE = chords.ChordTable(
+    [
+        # BUTTON 1: LC Button
+        chords.Chord("button1", press=[97, 125, 185], release=[97, 125, 185]),
+        # BUTTON 2: AYA small Button
+        chords.Chord("button2", press=[32, 125], release=[32, 125]),
+        # BUTTON 4: RC Button
+        chords.Chord("button4", press=[97, 125, 186], release=[97, 125, 186]),
+        # BUTTON 5: AYAspace
+        chords.Chord("button5", press=[97, 125, 187], release=[97, 125, 187]),
+        # BUTTON 6: T Button
+        chords.Chord("button6", press=[97, 125, 188], release=[97, 125, 188]),
+    ],
+    passthrough=[e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP],
+)
+process_event = CHORD_TABLE.process
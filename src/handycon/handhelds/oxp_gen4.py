@@ -5,6 +5,8 @@
 import os
 from evdev import ecodes as e
 
+from .. import chords
+
 handycon = None
 
 
@@ -30,127 +32,32 @@ def init_handheld(handheld_controller):
 
 
 # Captures keyboard events and translates them to virtual device events.
-async def process_event(seed_event, active_keys):
-    global handycon
-
-    # Button map shortcuts for easy reference.
-    button1 = handycon.button_map["button1"]
-    button2 = handycon.button_map["button2"]
-    button3 = handycon.button_map["button3"]
-    button4 = handycon.button_map["button4"]
-    button5 = handycon.button_map["button5"]
-    button6 = handycon.button_map["button6"]
-
-    # Loop variables
-    this_button = None
-    button_on = seed_event.value
-
-    # Automatically pass default keycodes we dont intend to replace.
-    if seed_event.code in [e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP]:
-        handycon.emit_event(seed_event)
-
-    # Handle missed keys.
-    if active_keys == [] and handycon.event_queue != []:
-        this_button = handycon.event_queue[0]
-
-    # BUTTON 1 (Possible dangerous fan activity!) Short press orange + |||||
-    if (
-        active_keys == [99, 125]
-        and button_on == 1
-        and button1 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button1)
-    elif (
-        active_keys == []
-        and seed_event.code in [99]
-        and button_on == 0
-        and button1 in handycon.event_queue
-    ):
-        this_button = button1
-
-    # BUTTON 2 (Default: QAM) Turbo Button
-    if (
-        active_keys == [29, 56, 125]
-        and button_on == 1
-        and button2 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button2)
-    elif (
-        active_keys == []
-        and seed_event.code in [29, 56]
-        and button_on == 0
-        and button2 in handycon.event_queue
-    ):
-        this_button = button2
-
-    # BUTTON 3 (Default: ESC) Short press orange + KB
-    if (
-        active_keys == [97, 100, 111]
-        and button_on == 1
-        and button3 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button3)
-    elif (
-        active_keys == []
-        and seed_event.code in [100, 111]
-        and button_on == 0
-        and button3 in handycon.event_queue
-    ):
-        this_button = button3
-
-    # BUTTON 4 (Default: OSK) Short press KB
-    if (
-        active_keys == [24, 97, 125]
-        and button_on == 1
-        and button4 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button4)
-    elif (
-        active_keys == []
-        and seed_event.code in [24]
-        and button_on == 0
-        and button4 in handycon.event_queue
-    ):
-        this_button = button4
-
-    # BUTTON 5 (Default: MODE) Short press orange
-    if (
-        active_keys == [32, 125]
-        and button_on == 1
-        and button5 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button5)
-    elif (
-        active_keys == []
-        and seed_event.code in [32]
-        and button_on == 0
-        and button5 in handycon.event_queue
-    ):
-        this_button = button5
-
-    # BUTTON 6 (Default: Launch Chimera) Long press orange
-    if (
-        active_keys == [34, 125]
-        and button_on == 1
-        and button6 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button6)
-    elif (
-        active_keys == []
-        and seed_event.code in [34]
-        and button_on == 0
-        and button6 in handycon.event_queue
-    ):
-        this_button = button6
-
-    # Create list of events to fire.
-    # Handle new button presses.
-    if this_button and not handycon.last_button:
-        handycon.event_queue.remove(this_button)
-        handycon.last_button = this_button
-        await handycon.emit_now(seed_event, this_button, 1)
-
-    # Clean up old button presses.
-    elif handycon.last_button and not this_button:
-        await handycon.emit_now(seed_event, handycon.last_button, 0)
-        handycon.last_button = None
+CHORD_TABLE = chords.ChordTable(
+    [
+        # BUTTON 1 (Possible dangerous fan activity!) Short press orange + |||||
+        chords.Chord("button1", press=[99, 125], release=[99], mode=chords.QUEUE),
+        # BUTTON 2 (Default: QAM) Turbo Button
+        chords.Chord(
+            "button2",
+            press=[29, 56, 125],
+            release=[29, 56],
+            mode=chords.QUEUE,
+        ),
+        # BUTTON 3 (Default: ESC) Short press orange + KB
+        chords.Chord(
+            "button3",
+            press=[97, 100, 111],
+            release=[100, 111],
+            mode=chords.QUEUE,
+        ),
+        # BUTTON 4 (Default: OSK) Short press KB
+        chords.Chord("button4", press=[24, 97, 125], release=[24], mode=chords.QUEUE),
+        # BUTTON 5 (Default: MODE) Short press orange
+        chords.Chord("button5", press=[32, 125], release=[32], mode=chords.QUEUE),
+        # BUTTON 6 (Default: Launch Chimera) Long press orange
+        chords.Chord("button6", press=[34, 125], release=[34], mode=chords.QUEUE),
+    ],
+    passthrough=[e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP],
+    queued=True,
+)
+process_event = CHORD_TABLE.process
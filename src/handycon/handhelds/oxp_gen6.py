@@ -5,7 +5,7 @@
 import os
 from evdev import ecodes as e
 
-from .. import constants as cons
+from .. import chords
 
 handycon = None
 
@@ -33,81 +33,27 @@ def init_handheld(handheld_controller):
 
 
 # Captures keyboard events and translates them to virtual device events.
-async def process_event(seed_event, active_keys):
-    global handycon
-
-    # Button map shortcuts for easy reference.
-    # Volume keys can either be volume or macro mode, map both to volume.
-    button0 = cons.EVENT_MAP["VOLUP"]
-    button00 = cons.EVENT_MAP["VOLDOWN"]
-    button2 = handycon.button_map["button2"]
-
-    # Loop variables
-    this_button = None
-    button_on = seed_event.value
-
-    # Automatically pass default keycodes we dont intend to replace.
-    if seed_event.code in [e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP]:
-        handycon.emit_event(seed_event)
-
-    # Handle missed keys.
-    if active_keys == [] and handycon.event_queue != []:
-        this_button = handycon.event_queue[0]
-
-    # Push volume keys for X1/X2 if they are not in volume mode.
-    # BUTTON 0 (VOLUP): X1
-    if (
-        active_keys == [32, 125]
-        and button_on == 1
-        and button0 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button0)
-    elif (
-        active_keys == []
-        and seed_event.code in [32]
-        and button_on == 0
-        and button0 in handycon.event_queue
-    ):
-        this_button = button0
-
-    # BUTTON 00 (VOLDOWN): X2
-    if (
-        active_keys == [24, 29, 125]
-        and button_on == 1
-        and button00 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button00)
-    elif (
-        active_keys == []
-        and seed_event.code in [24, 29]
-        and button_on == 0
-        and button00 in handycon.event_queue
-    ):
-        this_button = button00
-
-    # BUTTON 2 (Default: QAM) Turbo Button
-    if (
-        active_keys == [29, 56, 125]
-        and button_on == 1
-        and button2 not in handycon.event_queue
-    ):
-        handycon.event_queue.append(button2)
-    elif (
-        active_keys == []
-        and seed_event.code in [29, 56]
-        and button_on == 0
-        and button2 in handycon.event_queue
-    ):
-        this_button = button2
-
-    # Create list of events to fire.
-    # Handle new button presses.
-    if this_button and not handycon.last_button:
-        handycon.event_queue.remove(this_button)
-        handycon.last_button = this_button
-        await handycon.emit_now(seed_event, this_button, 1)
-
-    # Clean up old button presses.
-    elif handycon.last_button and not this_button:
-        await handycon.emit_now(seed_event, handycon.last_button, 0)
-        handycon.last_button = None
+CHORD_TABLE = chords.ChordTable(
+    [
+        # Push volume keys for X1/X2 if they are not in volume mode.
+        # BUTTON 0 (VOLUP): X1
+        chords.Chord("VOLUP", press=[32, 125], release=[32], mode=chords.QUEUE),
+        # BUTTON 00 (VOLDOWN): X2
+        chords.Chord(
+            "VOLDOWN",
+            press=[24, 29, 125],
+            release=[24, 29],
+            mode=chords.QUEUE,
+        ),
+        # BUTTON 2 (Default: QAM) Turbo Button
+        chords.Chord(
+            "button2",
+            press=[29, 56, 125],
+            release=[29, 56],
+            mode=chords.QUEUE,
+        ),
+    ],
+    passthrough=[e.KEY_VOLUMEDOWN, e.KEY_VOLUMEUP],
+    queued=True,
+)
+process_event = CHORD_TABLE.process
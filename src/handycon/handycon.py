@@ -13,7 +13,18 @@ import warnings
 
 # Local modules
 from .constants import *
+from . import chords
+from . import coalesce
+from . import curves
+from . import deviceindex
 from . import devices
+from . import hotplug
+from . import lagmonitor
+from . import macros
+from . import procdevices
+from . import realtime
+from . import timers
+from . import turbo
 from . import utilities
 
 # Partial imports
@@ -35,12 +46,38 @@ class HandheldController:
     # Session Variables
     config = None
     button_map = {}
-    event_queue = []  # Stores inng button presses to block spam
-    last_button = None
+    coalescer = None  # coalesce.Coalescer when a stick rate is configured
+    coalesce_rate = 0
+    controller_remap = None  # array of output codes by gamepad EV_KEY code
+    device_index = None  # deviceindex.DeviceIndex of the input event nodes
+    handheld = None  # Handheld module bound by utilities.id_system
+    hotplug = None  # hotplug.HotplugMonitor waking loops of missing devices
+    io_backend = "asyncio"
+    lag_monitor = None  # lagmonitor.LagMonitor when a lag threshold is set
+    lag_threshold = 0
     last_x_val = 0
+    latency = {}  # latency.LatencyHistogram of each measured device role
+    macros = None  # macros.MacroScheduler playing multi-key actions
+    proc_devices = None  # procdevices.ProcDevices parse of the input devices
     last_y_val = 0
     power_action = "Suspend"
+    lock_memory = True
+    measure_latency = False
+    passthrough_thread = None
+    reactor = None
+    read_backend = "raw"
+    realtime_cpus = None
+    realtime_priority = 0
+    realtime_thread = False
     running = False
+    axis_tables = {}  # Axis code -> (table, offset, mask) of shaped values
+    stick_curves = {}  # curves.Curve of each stick
+    trigger_curves = {}  # curves.Curve of each trigger
+    trigger_latches = {}  # Axis code -> curves.Latch of digital triggers
+    timers = None  # timers.TimerScheduler for precise delays
+    turbo = None  # turbo.Turbo when turbo buttons are configured
+    turbo_buttons = []
+    turbo_rate = 10
 
     # Handheld Config
     BUTTON_DELAY = 0.00
@@ -49,10 +86,14 @@ class HandheldController:
     CAPTURE_POWER = False
     GAMEPAD_ADDRESS = ""
     GAMEPAD_NAME = ""
+    GAMEPAD_USB = []  # (vendor, product, interface) candidates
     KEYBOARD_ADDRESS = ""
     KEYBOARD_NAME = ""
+    KEYBOARD_USB = []
     KEYBOARD_2_ADDRESS = ""
     KEYBOARD_2_NAME = ""
+    KEYBOARD_2_USB = []
+    LONG_PRESS_DELAY = 0.5
     POWER_BUTTON_PRIMARY = "LNXPWRBN/button/input0"
     POWER_BUTTON_SECONDARY = "PNP0C0C/button/input0"
 
@@ -63,6 +104,9 @@ class HandheldController:
 
     # UInput Devices
     controller_device = None
+    controller_latency = None  # Latency histograms, set while measuring
+    keyboard_latency = None
+    keyboard_2_latency = None
     keyboard_device = None
     keyboard_2_device = None
     power_device = None
@@ -76,12 +120,18 @@ class HandheldController:
     keyboard_2_event = None
     keyboard_2_path = None
 
+    # Statistics
+    frames_forwarded = 0
+    frame_events = 0
+    frame_writes = 0
+
     # Performance settings
     performance_mode = "--power-saving"
     thermal_mode = "0"
 
     def __init__(self):
         self.running = True
+        chords.set_handycon(self)
         devices.set_handycon(self)
         utilities.set_handycon(self)
         self.logger.info("Starting Handheld Game Console Controller Service...")
@@ -92,30 +142,74 @@ class HandheldController:
             exit()
         Path(HIDE_PATH).mkdir(parents=True, exist_ok=True)
         devices.restore_hidden()
+        self.device_index = deviceindex.DeviceIndex()
+        self.proc_devices = procdevices.ProcDevices()
         utilities.get_user()
         self.HAS_CHIMERA_LAUNCHER = os.path.isfile(CHIMERA_LAUNCHER_PATH)
         utilities.id_system()
+        devices.set_device_roles()
         utilities.get_config()
+        utilities.update_axis_tables(
+            curves.build_tables(self.stick_curves, self.trigger_curves)
+        )
         devices.make_controller()
+        if self.realtime_thread:
+            realtime.setup(self.logger, self.lock_memory)
 
         # Run asyncio loop to capture all events.
         self.loop = asyncio.get_event_loop()
-
-        # Attach the event loop of each device to the asyncio loop.
-        asyncio.ensure_future(devices.capture_controller_events())
-        asyncio.ensure_future(devices.capture_ff_events())
-        asyncio.ensure_future(devices.capture_keyboard_events())
-        if self.KEYBOARD_2_NAME != "" and self.KEYBOARD_2_ADDRESS != "":
-            asyncio.ensure_future(devices.capture_keyboard_2_events())
-
-        asyncio.ensure_future(devices.capture_power_events())
+        self.timers = timers.TimerScheduler(self.loop)
+        self.macros = macros.MacroScheduler(self.timers, devices.emit_event)
+        if self.turbo_buttons:
+            self.turbo = turbo.Turbo(
+                self.timers, self.ui_device.fd, self.turbo_buttons, self.turbo_rate
+            )
+        if self.coalesce_rate:
+            self.coalescer = coalesce.Coalescer(
+                self.timers, self.ui_device.fd, self.coalesce_rate
+            )
+        if self.realtime_thread and (self.turbo or self.coalescer):
+            self.logger.warn(
+                "Turbo and coalescing run on the event loop. realtime_thread ignored."
+            )
+        if self.lag_threshold:
+            self.lag_monitor = lagmonitor.LagMonitor(
+                self.loop, self.logger, self.lag_threshold / 1000
+            )
+            self.lag_monitor.start()
+        self.hotplug = hotplug.HotplugMonitor(
+            self.loop,
+            self.logger,
+            self.device_index,
+            self.proc_devices,
+            DETECT_DELAY,
+        )
+        self.hotplug.start()
+
+        # Attach every device to one epoll reactor, or the event loop of each
+        # device to the asyncio loop.
+        if self.io_backend == "epoll":
+            devices.start_reactor()
+        else:
+            asyncio.ensure_future(devices.capture_controller_events())
+            asyncio.ensure_future(devices.capture_ff_events())
+            asyncio.ensure_future(devices.capture_keyboard_events())
+            if devices.has_keyboard_2():
+                asyncio.ensure_future(devices.capture_keyboard_2_events())
+
+            asyncio.ensure_future(devices.capture_power_events())
         self.logger.info("Handheld Game Console Controller Service started.")
 
         # Establish signaling to handle gracefull shutdown.
-        for s in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
+        for s in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT):
             self.loop.add_signal_handler(
                 s, lambda s=s: asyncio.create_task(self.exit())
             )
+        self.loop.add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.create_task(self.reload_config())
+        )
+        self.loop.add_signal_handler(signal.SIGUSR1, devices.log_stats)
+        self.loop.add_signal_handler(signal.SIGUSR2, devices.dump_trace)
 
         try:
             self.loop.run_forever()
@@ -141,20 +235,38 @@ class HandheldController:
     def emit_event(self, event):
         devices.emit_event(event)
 
-    async def emit_events(self, events):
-        await devices.emit_events(events)
+    async def emit_events(self, events, latency=None):
+        await devices.emit_events(events, latency)
 
-    async def emit_now(self, seed_event, event_list, value):
-        await devices.emit_now(seed_event, event_list, value)
+    async def emit_now(self, seed_event, event_list, value, source=None):
+        await devices.emit_now(seed_event, event_list, value, source)
 
     async def do_rumble(self, button=0, interval=10, length=1000, delay=0):
         await devices.do_rumble(button, interval, length, delay)
 
-    async def handle_key_up(self, seed_event, queued_event):
-        await devices.handle_key_up(seed_event, queued_event)
+    async def handle_key_up(self, seed_event, source, action):
+        await devices.handle_key_up(seed_event, source, action)
 
-    async def handle_key_down(self, seed_event, queued_event):
-        await devices.handle_key_down(seed_event, queued_event)
+    async def handle_key_down(self, seed_event, source, action):
+        await devices.handle_key_down(seed_event, source, action)
+
+    # Reloads the config file. Triggered with SIGHUP. The button maps, axis
+    # curves, gamepad map and trace switch apply right away, the other [Input]
+    # settings and [Turbo] on restart. The axis tables are built on a worker
+    # thread so input keeps flowing.
+    async def reload_config(self):
+        self.logger.info("Reloading config.")
+        try:
+            utilities.get_config(reload=True)
+        except Exception as err:
+            self.logger.error(f"{err} | Unable to reload config.")
+            self.logger.error(traceback.format_exc())
+            return
+        tables = await self.loop.run_in_executor(
+            None, curves.build_tables, self.stick_curves, self.trigger_curves
+        )
+        utilities.update_axis_tables(tables)
+        self.logger.info("Config reloaded.")
 
     # Gracefull shutdown.
     async def exit(self):
@@ -191,6 +303,17 @@ class HandheldController:
                 pass
         self.logger.info("Devices restored.")
 
+        # Stop the epoll backend. The passthrough thread is otherwise stopped
+        # when its task is cancelled.
+        if self.reactor:
+            self.reactor.detach(self.loop)
+            if self.passthrough_thread:
+                self.passthrough_thread.finish()
+
+        if self.lag_monitor:
+            self.lag_monitor.stop()
+        self.hotplug.stop()
+
         # Kill all tasks. They are infinite loops so we will wait forver.
         for task in [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]:
             task.cancel()
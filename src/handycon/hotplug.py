@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import errno
+import socket
+import traceback
+
+# From linux/netlink.h. Group 1 carries the uevents sent by the kernel itself,
+# after devtmpfs has created the node.
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_EVENTS = 1
+RECEIVE_BUFFER = 1 << 20
+UEVENT_SIZE = 8192
+
+
+# Wakes whatever waits for an input device when the kernel reports its event
+# node, instead of polling for it. Input uevents keep the
+# deviceindex.DeviceIndex current and the callbacks waiting on the index role or
+# the (name, phys) of a new node run once. Callbacks waiting on other devices
+# stay asleep, so a device that never appears costs nothing. Any input uevent
+# invalidates the procdevices.ProcDevices parse. Where the uevent socket can't
+# be opened, callbacks run after delay seconds instead, as the polling did.
+class HotplugMonitor:
+    def __init__(self, loop, logger, index, proc_devices, delay):
+        self.loop = loop
+        self.logger = logger
+        self.index = index
+        self.proc_devices = proc_devices
+        self.delay = delay
+        self.sock = None
+        self.waiters = []  # (role or (name, phys), ...), callback
+
+        # Statistics
+        self.uevents = 0
+        self.wakeups = 0
+
+    def start(self):
+        try:
+            sock = socket.socket(
+                socket.AF_NETLINK,
+                socket.SOCK_DGRAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC,
+                NETLINK_KOBJECT_UEVENT,
+            )
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+            sock.bind((0, KERNEL_EVENTS))
+        except OSError as err:
+            self.logger.warn(
+                f"{err} | Unable to monitor hotplug events. Polling for devices."
+            )
+            return
+        self.sock = sock
+        self.loop.add_reader(sock.fileno(), self.receive)
+
+        # Devices may have changed before there was a socket to report it.
+        self.proc_devices.invalidate()
+
+    def stop(self):
+        if self.sock:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        self.waiters.clear()
+
+    # Calls callback() once, when a device appears that matched one of the keys,
+    # index roles or (name, phys) addresses.
+    def notify(self, callback, *keys):
+        if not self.sock:
+            self.loop.call_later(self.delay, callback)
+            return
+        self.waiters.append((keys, callback))
+
+    # Returns once a device appears that matched one of the keys.
+    async def wait(self, *keys):
+        future = self.loop.create_future()
+
+        def wake():
+            if not future.done():
+                future.set_result(None)
+
+        self.notify(wake, *keys)
+        await future
+
+    def receive(self):
+        while True:
+            try:
+                uevent = self.sock.recv(UEVENT_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as err:
+                if err.errno != errno.ENOBUFS:
+                    raise
+                # Uevents were dropped, so look for what changed instead.
+                self.logger.warn("Hotplug events were dropped. Rescanning devices.")
+                self.rescan()
+                continue
+            self.handle(uevent)
+
+    # Uevents are an "action@devpath" header followed by KEY=value fields, each
+    # NUL terminated.
+    def handle(self, uevent):
+        fields = uevent.split(b"\0")
+        if b"@" not in fields[0]:
+            return
+        properties = dict(field.split(b"=", 1) for field in fields[1:] if b"=" in field)
+        if properties.get(b"SUBSYSTEM") != b"input":
+            return
+        action = properties.get(b"ACTION")
+        if action in (b"add", b"remove"):
+            self.proc_devices.invalidate()
+        devname = properties.get(b"DEVNAME", b"")
+        if not devname.startswith(b"input/event"):
+            return
+        self.uevents += 1
+        event = devname[len(b"input/") :].decode()
+        if action == b"add":
+            info = self.index.add(event)
+            if info:
+                self.wake(info)
+        elif action == b"remove":
+            self.index.remove(event)
+
+    def rescan(self):
+        self.proc_devices.invalidate()
+        known = set(self.index.devices)
+        self.index.refresh()
+        for event, info in list(self.index.devices.items()):
+            if event not in known:
+                self.wake(info)
+
+    def wake(self, info):
+        address = (info.name, info.phys)
+        woken = []
+        waiting = []
+        for waiter in self.waiters:
+            keys = waiter[0]
+            if address in keys or (info.role and info.role in keys):
+                woken.append(waiter)
+            else:
+                waiting.append(waiter)
+        if not woken:
+            return
+        self.waiters = waiting
+        for keys, callback in woken:
+            self.wakeups += 1
+            try:
+                callback()
+            except Exception as err:
+                self.logger.error(f"{err} | Error attaching {info.name}.")
+                self.logger.error(traceback.format_exc())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Partial imports
+from evdev import ecodes as e
+
+
+# Returns the bitmask for a list of key codes.
+def keys_to_mask(keys):
+    mask = 0
+    for code in keys:
+        mask |= 1 << code
+    return mask
+
+
+# Tracks the pressed keys of an input device as an integer bitmask, updated from
+# the device's own event stream. The kernel is only queried with EVIOCGKEY when
+# the tracker is created and after the kernel reports dropped events.
+class KeyState:
+    def __init__(self, device):
+        self.device = device
+        self.dropped = False
+        self.mask = 0
+        self.resync()
+
+    def resync(self):
+        self.mask = keys_to_mask(self.device.active_keys())
+
+    # Applies a batch of events read together and returns the resulting mask.
+    def update(self, events):
+        mask = self.mask
+        for event in events:
+            if event.type == e.EV_KEY:
+                if self.dropped:
+                    continue
+                if event.value:
+                    mask |= 1 << event.code
+                else:
+                    mask &= ~(1 << event.code)
+            elif event.type == e.EV_SYN:
+                # Events up to the next SYN_REPORT are incomplete after a drop.
+                if event.code == e.SYN_DROPPED:
+                    self.dropped = True
+                elif self.dropped and event.code == e.SYN_REPORT:
+                    self.dropped = False
+                    self.resync()
+                    mask = self.mask
+        self.mask = mask
+        return mask
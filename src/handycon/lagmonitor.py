@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import asyncio.events
+import os
+import sys
+import threading
+import time
+import traceback
+
+# The loop runs every callback from Handle._run, so the frames below it are the
+# callback that blocked the loop.
+HANDLE_FILE = asyncio.events.__file__
+PACKAGE_DIR = os.path.dirname(__file__) + os.sep
+
+
+# Measures how late the event loop runs a heartbeat scheduled every threshold
+# seconds. A watchdog thread sleeps until each beat is overdue by the threshold
+# and, if the loop still hasn't run it, captures the loop thread's stack while
+# the blocking call is still on it. The stall is logged with that stack once the
+# loop runs again and counted under the coroutine or callback that blocked it.
+class LagMonitor:
+    def __init__(self, loop, logger, threshold):
+        self.loop = loop
+        self.logger = logger
+        self.threshold = int(threshold * 1e9)
+        self.expected = 0  # Deadline of the next beat in ns
+        self.beats = 0
+        self.handle = None
+        self.thread = None
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.capture = None  # (beat, name, stack) taken by the watchdog
+
+        # Statistics
+        self.max_lag = 0
+        self.stalls = {}  # name: [count, total ns, max ns]
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.expected = time.monotonic_ns() + self.threshold
+        self.handle = self.loop.call_at(self.expected / 1e9, self.beat)
+        self.thread = threading.Thread(
+            target=self.watch, name="lag monitor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def beat(self):
+        now = time.monotonic_ns()
+        lag = now - self.expected
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag > self.threshold:
+            self.stall(lag)
+        self.beats += 1
+        self.expected = now + self.threshold
+        self.handle = self.loop.call_at(self.expected / 1e9, self.beat)
+
+    # Counts a stall under the name the watchdog captured for this beat. Stalls
+    # that ended before the watchdog looked are counted as unknown.
+    def stall(self, lag):
+        capture = self.capture
+        self.capture = None
+        if capture and capture[0] == self.beats:
+            name, stack = capture[1], capture[2]
+        else:
+            name, stack = "unknown", ""
+        stats = self.stalls.setdefault(name, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += lag
+        stats[2] = max(stats[2], lag)
+        self.logger.warn(
+            f"Event loop stalled for {lag / 1e6:.1f} ms in {name}.\n{stack}".rstrip()
+        )
+
+    # Runs on the watchdog thread. The loop thread's attributes are only read
+    # here, so a stale value at worst skips or repeats one check.
+    def watch(self):
+        captured = None
+        while True:
+            beat = self.beats
+            if beat == captured:
+                # Wait for the stall that was captured to end.
+                timeout = self.threshold
+            else:
+                timeout = self.expected + self.threshold - time.monotonic_ns()
+            if self.stopped.wait(max(timeout, 0) / 1e9):
+                return
+            if beat == self.beats and beat != captured:
+                self.capture = (beat, *self.blocked())
+                captured = beat
+
+    # Returns the name of the task or callback running on the loop thread, with
+    # the innermost function of ours it is blocked in, and the stack below it.
+    def blocked(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return "unknown", ""
+        stack = traceback.extract_stack(frame)
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index].filename == HANDLE_FILE and stack[index].name == "_run":
+                stack = stack[index + 1 :]
+                break
+        if not stack:
+            return "unknown", ""
+        task = asyncio.current_task(self.loop)
+        if task:
+            name = task.get_coro().__qualname__
+        else:
+            name = stack[0].name
+        for summary in reversed(stack):
+            if summary.filename.startswith(PACKAGE_DIR):
+                if summary.name != name:
+                    name = f"{name} > {summary.name}"
+                break
+        return name, "".join(traceback.format_list(stack))
+
+    def report(self):
+        self.logger.info(
+            f"Event loop beats: {self.beats}, max lag: {self.max_lag / 1e6:.1f} ms"
+        )
+        for name, (count, total, longest) in sorted(
+            self.stalls.items(), key=lambda item: -item[1][1]
+        ):
+            self.logger.info(
+                f"Event loop stalls in {name}: {count}, total: {total / 1e6:.1f} ms, max: {longest / 1e6:.1f} ms"
+            )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Partial imports
+from array import array
+
+# Log-linear buckets in the style of an HDR histogram. Values below SUB_BUCKETS
+# microseconds get a bucket each and every power of two above that is split into
+# SUB_BUCKETS / 2 linear buckets, so a value is reported within 1/8 of itself.
+# Values past the last bucket, over 2^40 microseconds, share it.
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS // 2
+MAX_SHIFT = 36
+BUCKETS = SUB_BUCKETS + MAX_SHIFT * HALF_BUCKETS
+
+
+def bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    if shift > MAX_SHIFT:
+        return BUCKETS - 1
+    return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS
+
+
+# Returns the largest value counted in a bucket.
+def bucket_limit(index):
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, HALF_BUCKETS)
+    shift += 1
+    return ((offset + HALF_BUCKETS + 1) << shift) - 1
+
+
+# Counts the time between an event's kernel timestamp and its write to the
+# virtual device for one input device. Recording is a bucket increment, cheap
+# enough for every write, and percentiles are only worked out when asked for.
+class LatencyHistogram:
+    def __init__(self, name):
+        self.name = name
+        self.counts = array("Q", bytes(8 * BUCKETS))
+        self.total = 0
+        self.max = 0
+
+    # Records a latency in nanoseconds. Negative latencies come from timestamps
+    # taken just before a clock change and count as zero.
+    def record(self, latency):
+        latency = max(latency // 1000, 0)
+        self.counts[bucket_index(latency)] += 1
+        self.total += 1
+        if latency > self.max:
+            self.max = latency
+
+    # Returns the latency in microseconds that fraction of the samples are at or
+    # under.
+    def percentile(self, fraction):
+        if not self.total:
+            return 0
+        target = max(int(self.total * fraction + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(bucket_limit(index), self.max)
+        return self.max
+
+    def __str__(self):
+        return (
+            f"{self.name} latency samples: {self.total}, p50: {self.percentile(0.5)}us, "
+            f"p99: {self.percentile(0.99)}us, max: {self.max}us"
+        )
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import ctypes
+import ctypes.util
+import fcntl
+import os
+import struct
+
+# Linux system calls the os module doesn't wrap on every supported Python.
+
+# mlockall flags from sys/mman.h
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+# timerfd flags from sys/timerfd.h
+CLOCK_MONOTONIC = 1
+TFD_NONBLOCK = os.O_NONBLOCK
+TFD_CLOEXEC = os.O_CLOEXEC
+TFD_TIMER_ABSTIME = 1
+
+# _IOW('E', 0xa0, int) from linux/input.h
+EVIOCSCLOCKID = 0x400445A0
+
+libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", timespec), ("it_value", timespec)]
+
+
+def check(result):
+    if result < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return result
+
+
+def mlockall(flags):
+    check(libc.mlockall(flags))
+
+
+def timerfd_create(clock_id=CLOCK_MONOTONIC, flags=TFD_NONBLOCK | TFD_CLOEXEC):
+    return check(libc.timerfd_create(clock_id, flags))
+
+
+# Arms the timer to expire at the absolute deadline, in nanoseconds of the
+# timer's clock, and then every interval nanoseconds. A deadline of 0 disarms it.
+def timerfd_settime_ns(fd, deadline, interval=0):
+    spec = itimerspec()
+    spec.it_value.tv_sec, spec.it_value.tv_nsec = divmod(deadline, 1_000_000_000)
+    spec.it_interval.tv_sec, spec.it_interval.tv_nsec = divmod(interval, 1_000_000_000)
+    check(libc.timerfd_settime(fd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None))
+
+
+# Sets the clock an evdev fd timestamps its events with.
+def set_clock_id(fd, clock_id):
+    fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack("i", clock_id))
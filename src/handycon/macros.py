@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Partial imports
+from collections import deque
+
+
+# Plays the events of multi-key actions on a timeline of timers.TimerScheduler
+# deadlines instead of sleeping between them. play() queues each event with a deadline and returns at once,
+# so input keeps being read while a macro runs. Events are emitted in the order
+# they were queued. An action starts no earlier than the last event already
+# queued, so overlapping macros never interleave.
+# Events played with a latency.LatencyHistogram record the time from their
+# timestamp to their write, less the delay they were scheduled with.
+class MacroScheduler:
+    def __init__(self, timers, emit):
+        self.timers = timers
+        self.emit = emit
+        self.steps = deque()  # (deadline in ns, event, latency, scheduled delay)
+        self.tail = 0  # Deadline of the last queued event
+        self.timer = None
+
+    def __len__(self):
+        return len(self.steps)
+
+    # Queues events to be emitted delay seconds apart, starting now or when the
+    # events queued before them are done.
+    def play(self, events, delay, latency=None):
+        now = self.timers.now()
+        deadline = max(now, self.tail)
+        delay = int(delay * 1e9)
+        for event in events:
+            self.steps.append((deadline, event, latency, deadline - now))
+            self.tail = deadline
+            deadline += delay
+
+        # A pending timer is already due before these events.
+        if not self.timer:
+            self.run()
+
+    # Emits every event that is due and waits for the next deadline.
+    def run(self):
+        self.timer = None
+        now = self.timers.now()
+        steps = self.steps
+        while steps and steps[0][0] <= now:
+            _, event, latency, scheduled = steps.popleft()
+            self.emit(event)
+            if latency:
+                latency.record(
+                    self.timers.now()
+                    - event.sec * 1_000_000_000
+                    - event.usec * 1000
+                    - scheduled
+                )
+        if steps:
+            self.timer = self.timers.call_at(steps[0][0], self.run)
+
+    # Drops queued events, such as on shutdown.
+    def cancel(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.steps.clear()
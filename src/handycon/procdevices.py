@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+PROC_DEVICES = "/proc/bus/input/devices"
+
+
+# One device block of /proc/bus/input/devices.
+class ProcDevice:
+    __slots__ = (
+        "bus",
+        "vendor",
+        "product",
+        "version",
+        "name",
+        "phys",
+        "sysfs",
+        "uniq",
+        "handlers",
+    )
+
+    def __init__(self):
+        self.bus = 0
+        self.vendor = 0
+        self.product = 0
+        self.version = 0
+        self.name = ""
+        self.phys = ""
+        self.sysfs = ""
+        self.uniq = ""
+        self.handlers = ()
+
+    def __repr__(self):
+        return f"ProcDevice({self.name!r}, {self.phys!r}, {self.sysfs!r})"
+
+
+# Parses /proc/bus/input/devices into ProcDevice records indexed by phys. The
+# parse is kept until invalidate(), which the hotplug monitor calls whenever an
+# input device comes or goes.
+class ProcDevices:
+    def __init__(self, path=PROC_DEVICES):
+        self.path = path
+        self.devices = None
+        self.by_phys = {}  # phys -> [ProcDevice]
+
+        # Statistics
+        self.parses = 0
+
+    # Parses the file unless the last parse is still current. Returns False if
+    # the file doesn't exist yet.
+    def load(self):
+        if self.devices is not None:
+            return True
+        try:
+            with open(self.path) as proc_devices:
+                text = proc_devices.read()
+        except FileNotFoundError:
+            return False
+        self.parses += 1
+        self.devices = parse(text)
+        self.by_phys = {}
+        for device in self.devices:
+            self.by_phys.setdefault(device.phys, []).append(device)
+        return True
+
+    def invalidate(self):
+        self.devices = None
+
+    # Returns the first of the candidate phys addresses a device has, or "".
+    def first_phys(self, candidates):
+        self.load()
+        for phys in candidates:
+            if phys in self.by_phys:
+                return phys
+        return ""
+
+
+# Device blocks are separated by blank lines and each line is a one letter type,
+# ": " and the fields. The B: bitmap lines aren't used and are skipped.
+def parse(text):
+    devices = []
+    for block in text.split("\n\n"):
+        if not block.strip():
+            continue
+        device = ProcDevice()
+        devices.append(device)
+        for line in block.splitlines():
+            kind = line[:1]
+            if kind == "N":
+                device.name = unquote(line[len("N: Name=") :])
+            elif kind == "P":
+                device.phys = line[len("P: Phys=") :]
+            elif kind == "S":
+                device.sysfs = line[len("S: Sysfs=") :]
+            elif kind == "H":
+                device.handlers = tuple(line[len("H: Handlers=") :].split())
+            elif kind == "U":
+                device.uniq = line[len("U: Uniq=") :]
+            elif kind == "I":
+                for field in line[3:].split():
+                    key, _, value = field.partition("=")
+                    if key in ("Bus", "Vendor", "Product", "Version"):
+                        setattr(device, key.lower(), int(value, 16))
+    return devices
+
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
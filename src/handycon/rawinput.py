@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import os
+
+# Local modules
+from .constants import *
+from .curves import TRIGGER_MAX
+
+# Partial imports
+from evdev import InputEvent
+
+# Layout of struct input_event in 16 bit words. The timeval is two longs, so the
+# type and code follow it directly and the 32 bit value follows them.
+EVENT_SIZE = EVENT_STRUCT.size
+EVENT_WORDS = EVENT_SIZE // 2
+TYPE_WORD = struct.calcsize("ll") // 2
+CODE_WORD = TYPE_WORD + 1
+VALUE_WORD = TYPE_WORD + 2
+EVENT_LONGS = EVENT_SIZE // struct.calcsize("l")
+READ_EVENTS = 64
+
+
+# Reads batches of struct input_event records from an evdev file descriptor into
+# a preallocated buffer. Records are decoded through memoryview casts over the
+# same buffer, so reading and inspecting events allocates no InputEvent objects.
+class RawReader:
+    def __init__(self, fd, count=READ_EVENTS):
+        self.fd = fd
+        self.buffer = bytearray(EVENT_SIZE * count)
+        self.view = memoryview(self.buffer)
+        self.words = self.view.cast("H")
+        self.values = self.view[VALUE_WORD * 2 :].cast("i")
+        self.times = self.view.cast("l")
+
+    # Reads the next batch and returns the number of complete records in it.
+    # Records before start are kept, so a caller can carry a partial frame over
+    # to the next read.
+    async def read(self, start=0):
+        while True:
+            count = self.read_now(start)
+            if count is not None:
+                return count
+            await self.wait_readable()
+
+    # Reads without waiting. Returns None if no events are ready.
+    def read_now(self, start=0):
+        try:
+            size = os.readv(self.fd, [self.view[start * EVENT_SIZE :]])
+        except BlockingIOError:
+            return None
+        if size == 0:
+            raise OSError(f"End of file reading events from fd {self.fd}.")
+        return start + size // EVENT_SIZE
+
+    async def wait_readable(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        loop.add_reader(self.fd, future.set_result, None)
+        try:
+            await future
+        finally:
+            loop.remove_reader(self.fd)
+
+    def type(self, index):
+        return self.words[index * EVENT_WORDS + TYPE_WORD]
+
+    def code(self, index):
+        return self.words[index * EVENT_WORDS + CODE_WORD]
+
+    def value(self, index):
+        return self.values[index * EVENT_WORDS // 2]
+
+    # Returns the record's timestamp in nanoseconds.
+    def time_ns(self, index):
+        long = index * EVENT_LONGS
+        return self.times[long] * 1_000_000_000 + self.times[long + 1] * 1000
+
+    # Decodes the first count records into InputEvent objects for the loops that
+    # need them, such as chord processing.
+    def events(self, count):
+        return [
+            InputEvent(*fields)
+            for fields in EVENT_STRUCT.iter_unpack(self.view[: count * EVENT_SIZE])
+        ]
+
+    # Filters records start to count in place for passthrough. EV_FF and
+    # EV_UINPUT records are dropped and a SYN_DROPPED discards the frame it
+    # interrupted. EV_KEY codes are replaced with their entry in the remap array
+    # and records for codes in keys are then taken out of the stream and
+    # appended to taken as (code, value). EV_ABS values of axes in tables
+    # are replaced with their entry in the axis' curves table and then, for axes
+    # in latches, with the digital trigger value (see curves.shape). EV_ABS
+    # records for codes in axes are then taken out into the latest dict, keeping
+    # only the newest value of each, and frames left empty by that are dropped.
+    # Returns the number of records kept, how many of them end in a SYN_REPORT,
+    # and the number of frames those contain.
+    def compact(
+        self,
+        start,
+        count,
+        keys=None,
+        taken=None,
+        axes=None,
+        latest=None,
+        tables=None,
+        latches=None,
+        remap=None,
+    ):
+        view = self.view
+        words = self.words
+        kept = start
+        reported = 0
+        frames = 0
+        for index in range(start, count):
+            word = index * EVENT_WORDS
+            event_type = words[word + TYPE_WORD]
+
+            # Block FF events, or get infinite recursion.
+            if event_type == e.EV_FF or event_type == e.EV_UINPUT:
+                continue
+
+            if event_type == e.EV_KEY and (remap or keys):
+                code = words[word + CODE_WORD]
+                if remap:
+                    code = remap[code]
+                    words[word + CODE_WORD] = code
+                if keys and code in keys:
+                    taken.append((code, self.values[word // 2]))
+                    continue
+
+            elif event_type == e.EV_ABS and (tables or latches or axes):
+                code = words[word + CODE_WORD]
+                entry = tables.get(code) if tables else None
+                if entry:
+                    table, offset, mask = entry
+                    value = word // 2
+                    self.values[value] = table[(self.values[value] + offset) & mask]
+                latch = latches.get(code) if latches else None
+                if latch:
+                    value = word // 2
+                    if latch.on:
+                        latch.on = self.values[value] > latch.release
+                    else:
+                        latch.on = self.values[value] >= latch.press
+                    self.values[value] = TRIGGER_MAX if latch.on else 0
+                if axes and code in axes:
+                    latest[code] = self.values[word // 2]
+                    continue
+
+            elif event_type == e.EV_SYN:
+                code = words[word + CODE_WORD]
+
+                # The kernel discards incomplete frames after SYN_DROPPED, so do
+                # the same.
+                if code == e.SYN_DROPPED:
+                    kept = reported
+                    continue
+                if code == e.SYN_REPORT:
+                    if axes and kept == reported:
+                        continue
+                    frames += 1
+                    reported = kept + 1
+
+            if kept != index:
+                view[kept * EVENT_SIZE : (kept + 1) * EVENT_SIZE] = view[
+                    index * EVENT_SIZE : (index + 1) * EVENT_SIZE
+                ]
+            kept += 1
+
+        # A frame larger than the buffer is passed on as is rather than stalling
+        # the reader.
+        if kept == len(self.buffer) // EVENT_SIZE and not reported:
+            reported = kept
+        return kept, reported, frames
+
+    # Moves the records from start to end to the front of the buffer.
+    def carry(self, start, end):
+        if start and end > start:
+            self.view[: (end - start) * EVENT_SIZE] = self.view[
+                start * EVENT_SIZE : end * EVENT_SIZE
+            ]
+        return end - start
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import select
+import traceback
+
+# Registered fds only report input and errors.
+READ_EVENTS = select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP
+
+
+# Dispatches readiness for every device fd from a single epoll set. The epoll fd
+# is the only fd the asyncio loop watches, so one loop wakeup serves all ready
+# devices and handlers run inline without a task switch per event.
+class Reactor:
+    def __init__(self, logger):
+        self.logger = logger
+        self.epoll = select.epoll()
+        self.handlers = {}
+
+        # Statistics
+        self.wakeups = 0
+        self.dispatches = 0
+
+    def __contains__(self, fd):
+        return fd in self.handlers
+
+    # Calls handler() whenever fd is readable. If the handler raises, or the fd
+    # reports an error, the fd is unregistered and on_error(err) is called.
+    def register(self, fd, handler, on_error):
+        self.handlers[fd] = (handler, on_error)
+        self.epoll.register(fd, READ_EVENTS)
+
+    def unregister(self, fd):
+        if self.handlers.pop(fd, None):
+            try:
+                self.epoll.unregister(fd)
+            except (OSError, ValueError):
+                pass
+
+    def attach(self, loop):
+        loop.add_reader(self.epoll.fileno(), self.dispatch)
+
+    def detach(self, loop):
+        loop.remove_reader(self.epoll.fileno())
+
+    def dispatch(self):
+        self.wakeups += 1
+        for fd, events in self.epoll.poll(0):
+            if fd not in self.handlers:
+                continue
+            handler, on_error = self.handlers[fd]
+            self.dispatches += 1
+            try:
+                if events & select.EPOLLIN:
+                    handler()
+                else:
+                    raise OSError(f"Error condition {events:#x} on fd {fd}.")
+            except Exception as err:
+                self.logger.error(f"{err} | Error handling events from fd {fd}.")
+                self.logger.error(traceback.format_exc())
+                self.unregister(fd)
+                on_error(err)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import os
+import select
+import sys
+import threading
+import time
+
+# Local modules
+from .linux import MCL_CURRENT, MCL_FUTURE, mlockall
+from .rawinput import EVENT_SIZE, RawReader
+
+# Worst case time the passthrough thread waits for the GIL after waking.
+SWITCH_INTERVAL = 0.0005
+
+
+# Locks all current and future pages of the process in memory so the
+# passthrough never takes a page fault.
+def lock_memory():
+    mlockall(MCL_CURRENT | MCL_FUTURE)
+
+
+# Forwards controller records to the uinput fd from a dedicated OS thread. The
+# thread only touches the two fds and its own buffer. The event loop stops it
+# through stop_fd and is told it exited through done_fd, both eventfds, so no
+# locks or asyncio calls cross between them.
+class PassthroughThread(threading.Thread):
+    def __init__(
+        self,
+        controller_fd,
+        ui_fd,
+        logger,
+        priority=0,
+        cpus=None,
+        latency=None,
+        tables=None,
+        latches=None,
+        remap=None,
+    ):
+        super().__init__(name="passthrough", daemon=True)
+        self.reader = RawReader(controller_fd)
+        self.ui_fd = ui_fd
+        self.logger = logger
+        self.priority = priority
+        self.cpus = cpus
+        self.latency = latency  # Only recorded into by the thread
+        self.tables = tables  # Axis curve tables, replaced whole on reload
+        self.latches = latches  # Digital triggers, replaced whole on reload
+        self.remap = remap  # Button remap array, set or updated in place on reload
+        self.stop_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        self.done_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        self.error = None
+
+        # Statistics, written only by the thread.
+        self.frames_forwarded = 0
+        self.frame_events = 0
+        self.frame_writes = 0
+
+    # Applies the scheduling settings to the calling thread. Failures are logged
+    # and the thread runs with normal scheduling.
+    def set_scheduling(self):
+        if self.cpus:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError as err:
+                self.logger.warn(f"{err} | Unable to pin passthrough thread.")
+        if self.priority:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+            except OSError as err:
+                self.logger.warn(
+                    f"{err} | Unable to set SCHED_FIFO for passthrough thread."
+                )
+
+    def run(self):
+        try:
+            self.set_scheduling()
+            self.forward()
+        except Exception as err:
+            self.error = err
+        finally:
+            os.eventfd_write(self.done_fd, 1)
+
+    def forward(self):
+        reader = self.reader
+        latency = self.latency
+        poller = select.poll()
+        poller.register(reader.fd, select.POLLIN)
+        poller.register(self.stop_fd, select.POLLIN)
+        pending = 0
+        while True:
+            count = reader.read_now(pending)
+            if count is None:
+                for fd, events in poller.poll():
+                    if fd == self.stop_fd:
+                        return
+                    if events & (select.POLLERR | select.POLLHUP | select.POLLNVAL):
+                        raise OSError(f"Controller fd {fd} was closed.")
+                continue
+            # Read per batch, so a reload takes effect with the next one.
+            kept, reported, frames = reader.compact(
+                pending,
+                count,
+                tables=self.tables,
+                latches=self.latches,
+                remap=self.remap,
+            )
+            if reported:
+                os.write(self.ui_fd, reader.view[: reported * EVENT_SIZE])
+                if latency:
+                    latency.record(time.monotonic_ns() - reader.time_ns(0))
+                self.frames_forwarded += frames
+                self.frame_events += reported
+                self.frame_writes += 1
+            pending = reader.carry(reported, kept)
+
+    def stop(self):
+        os.eventfd_write(self.stop_fd, 1)
+
+    # Waits on the event loop for the thread to exit and raises its error, if
+    # any, so callers can treat it like the asyncio passthrough.
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        loop.add_reader(self.done_fd, future.set_result, None)
+        try:
+            await future
+        finally:
+            loop.remove_reader(self.done_fd)
+            self.finish()
+        if self.error:
+            raise self.error
+
+    # Stops the thread if it is still running and releases its eventfds.
+    def finish(self):
+        self.stop()
+        self.join()
+        os.close(self.stop_fd)
+        os.close(self.done_fd)
+
+
+# Prepares the process for a real time passthrough thread.
+def setup(logger, lock=True):
+    if lock:
+        try:
+            lock_memory()
+        except OSError as err:
+            logger.warn(f"{err} | Unable to lock memory.")
+
+    # The thread wakes from poll() holding no GIL, so bound how long the main
+    # thread can keep it.
+    sys.setswitchinterval(SWITCH_INTERVAL)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import heapq
+import itertools
+import os
+import time
+
+# Local modules
+from .linux import timerfd_create, timerfd_settime_ns
+
+# Deadlines this close after the one that fired run in the same wakeup.
+COALESCE_NS = 100_000
+
+
+# A scheduled callback. cancel() keeps it from running.
+class TimerHandle:
+    __slots__ = ("scheduler", "deadline", "callback", "args")
+
+    def __init__(self, scheduler, deadline, callback, args):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        if self.callback:
+            self.callback = None
+            self.scheduler.cancelled()
+
+
+# Runs callbacks at absolute CLOCK_MONOTONIC deadlines from one timerfd watched
+# by the event loop. The timerfd is always armed for the earliest pending
+# deadline, with nanosecond resolution, where asyncio sleeps are rounded to the
+# millisecond timeout of epoll_wait. Deadlines within COALESCE_NS of each other
+# share a wakeup. Times are time.monotonic_ns() values, which read the same
+# clock.
+class TimerScheduler:
+    def __init__(self, loop):
+        self.loop = loop
+        self.fd = timerfd_create()
+        self.heap = []
+        self.order = itertools.count()
+        self.armed = 0
+        self.expiring = False
+        loop.add_reader(self.fd, self.expire)
+
+        # Statistics
+        self.wakeups = 0
+
+    def now(self):
+        return time.monotonic_ns()
+
+    def call_at(self, deadline, callback, *args):
+        handle = TimerHandle(self, deadline, callback, args)
+        heapq.heappush(self.heap, (deadline, next(self.order), handle))
+        if not self.expiring and (not self.armed or deadline < self.armed):
+            self.arm(deadline)
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now() + int(delay * 1e9), callback, *args)
+
+    # Sleeps until an absolute deadline in ns.
+    async def sleep_until(self, deadline):
+        future = self.loop.create_future()
+        handle = self.call_at(deadline, set_done, future)
+        try:
+            await future
+        finally:
+            handle.cancel()
+
+    async def sleep(self, delay):
+        await self.sleep_until(self.now() + int(delay * 1e9))
+
+    def arm(self, deadline):
+        self.armed = deadline
+        timerfd_settime_ns(self.fd, deadline)
+
+    # Drops cancelled handles from the front of the heap and rearms for the
+    # next live deadline, or disarms, so cancelled timers cost no wakeup.
+    def cancelled(self):
+        heap = self.heap
+        if self.expiring or not heap or heap[0][2].callback:
+            return
+        while heap and not heap[0][2].callback:
+            heapq.heappop(heap)
+        if heap:
+            if heap[0][0] != self.armed:
+                self.arm(heap[0][0])
+        elif self.armed:
+            self.arm(0)
+
+    def expire(self):
+        try:
+            os.read(self.fd, 8)
+        except BlockingIOError:
+            pass
+        self.wakeups += 1
+        self.armed = 0
+
+        # Callbacks may schedule more timers. The timerfd is armed once they
+        # are done.
+        self.expiring = True
+        heap = self.heap
+        limit = self.now() + COALESCE_NS
+        while heap and heap[0][0] <= limit:
+            handle = heapq.heappop(heap)[2]
+            if not handle.callback:
+                continue
+            try:
+                handle.callback(*handle.args)
+            except Exception as err:
+                self.loop.call_exception_handler(
+                    {"message": "Error in timer callback", "exception": err}
+                )
+        self.expiring = False
+
+        # Drop cancelled handles at the front so they don't cause wakeups.
+        while heap and not heap[0][2].callback:
+            heapq.heappop(heap)
+        if heap:
+            self.arm(heap[0][0])
+
+    def close(self):
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+def set_done(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import os
+import struct
+import sys
+import time
+
+# Local modules
+from .constants import TRACE_PATH
+
+# Hot path tracing. Call sites are guarded with "if tracing.enabled:", so a
+# disabled trace costs one attribute check and never formats anything. When
+# enabled, each call packs one fixed size binary record into a ring buffer that
+# is written out with dump() and read back with read().
+
+# Trace points
+SEED_EVENT = 1  # count: active keys, extra: queued events
+POWER_EVENT = 2
+EMIT_EVENT = 3
+EMIT_LIST = 4  # type and code of the first event, count: events in the list
+
+POINT_NAMES = {
+    SEED_EVENT: "seed",
+    POWER_EVENT: "power",
+    EMIT_EVENT: "emit",
+    EMIT_LIST: "emit_list",
+}
+
+# Monotonic time in ns, point, event type, code, count, value, extra.
+RECORD = struct.Struct("<qHHHHii")
+RECORDS = 4096
+
+enabled = False
+ring = None
+capacity = 0
+index = 0
+
+pack_into = RECORD.pack_into
+monotonic_ns = time.monotonic_ns
+
+
+def enable(records=RECORDS):
+    global enabled, ring, capacity, index
+    ring = bytearray(RECORD.size * records)
+    capacity = records
+    index = 0
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def record(point, event_type, code, value, count=0, extra=0):
+    global index
+    pack_into(
+        ring,
+        index % capacity * RECORD.size,
+        monotonic_ns(),
+        point,
+        event_type,
+        code,
+        count,
+        value,
+        extra,
+    )
+    index += 1
+
+
+# Writes the buffered records to path, oldest first. Returns the record count.
+# The directory is created private to the service and the file is never opened
+# through a symlink, as the service runs as root.
+def dump(path):
+    if not ring:
+        return 0
+    if index <= capacity:
+        data = ring[: index * RECORD.size]
+    else:
+        split = index % capacity * RECORD.size
+        data = ring[split:] + ring[:split]
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+    with open(fd, "wb") as trace_file:
+        trace_file.write(data)
+    return len(data) // RECORD.size
+
+
+# Yields the records of a dump as tuples in RECORD field order.
+def read(path):
+    with open(path, "rb") as trace_file:
+        yield from RECORD.iter_unpack(trace_file.read())
+
+
+def format_record(fields):
+    time_ns, point, event_type, code, count, value, extra = fields
+    name = POINT_NAMES.get(point, str(point))
+    return f"{time_ns / 1e9:.6f} {name} type={event_type} code={code} value={value} count={count} extra={extra}"
+
+
+if __name__ == "__main__":
+    for fields in read(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH):
+        print(format_record(fields))
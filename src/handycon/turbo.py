@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import os
+
+# Local modules
+from .constants import *
+
+SYN_RECORD = EVENT_STRUCT.pack(0, 0, e.EV_SYN, e.SYN_REPORT, 0)
+
+
+# Autofire for gamepad buttons. The controller passthrough hands presses and
+# releases of the configured buttons to update() instead of forwarding them.
+# While any of them is held, one periodic timers.TimerScheduler deadline toggles
+# all held buttons together and writes them with a single SYN_REPORT. When
+# nothing is held no timer is pending.
+class Turbo:
+    def __init__(self, timers, ui_fd, buttons, rate):
+        self.timers = timers
+        self.ui_fd = ui_fd
+        self.buttons = frozenset(buttons)
+        self.period = int(1e9 / (rate * 2))  # One toggle per tick
+        self.held = {}  # Held button code -> state last written
+        self.deadline = 0
+        self.timer = None
+
+        # Statistics
+        self.ticks = 0
+
+    def update(self, code, value):
+        if value == 2:
+            return
+        if value:
+            if code in self.held:
+                return
+            self.held[code] = 1
+            self.write(((code, 1),))
+            if not self.timer:
+                self.deadline = self.timers.now() + self.period
+                self.timer = self.timers.call_at(self.deadline, self.tick)
+            return
+
+        if self.held.pop(code, None) == 1:
+            self.write(((code, 0),))
+        if not self.held and self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def tick(self):
+        held = self.held
+        for code in held:
+            held[code] ^= 1
+        self.write(held.items())
+        self.ticks += 1
+
+        # Deadlines advance by whole periods so the rate doesn't drift. Ticks
+        # missed while the loop was busy are skipped, not replayed.
+        self.deadline += self.period
+        now = self.timers.now()
+        if self.deadline < now:
+            self.deadline = now + self.period
+        self.timer = self.timers.call_at(self.deadline, self.tick)
+
+    def write(self, states):
+        os.write(
+            self.ui_fd,
+            b"".join(
+                [
+                    EVENT_STRUCT.pack(0, 0, e.EV_KEY, code, state)
+                    for code, state in states
+                ]
+            )
+            + SYN_RECORD,
+        )
+
+    # Releases everything still held, such as when the controller goes away.
+    def reset(self):
+        for code in list(self.held):
+            self.update(code, 0)
@@ -40,9 +40,13 @@ import handycon.handhelds.oxp_gen4 as oxp_gen4
 import handycon.handhelds.oxp_gen5 as oxp_gen5
 import handycon.handhelds.oxp_gen6 as oxp_gen6
 import handycon.handhelds.oxp_gen7 as oxp_gen7
+from .actions import ACTION_MAP
 from .constants import *
+from . import curves
+from . import tracing
 
 # Partial imports
+from array import array
 from time import sleep
 
 handycon = None
@@ -97,7 +101,7 @@ def id_system():
     # Verify all system hardweare has initialized.
     handycon.logger.info("Identifying system hardware.")
     timeout = 0
-    while not os.path.exists("/proc/bus/input/devices"):
+    while not handycon.proc_devices.load():
         sleep(1)
         timeout += 1
         if timeout == 30:
@@ -108,25 +112,21 @@ def id_system():
 
     # ANBERNIC Devices
     if system_id in ("Win600",):
-        handycon.system_type = "ANB_GEN1"
-        anb_gen1.init_handheld(handycon)
+        set_handheld("ANB_GEN1", anb_gen1)
 
     # AOKZOE Devices
     elif system_id in ("AOKZOE A1 AR07",):
-        handycon.system_type = "AOK_GEN1"
-        aok_gen1.init_handheld(handycon)
+        set_handheld("AOK_GEN1", aok_gen1)
 
     elif system_id in ("AOKZOE A1 Pro",):
-        handycon.system_type = "AOK_GEN2"
-        aok_gen2.init_handheld(handycon)
+        set_handheld("AOK_GEN2", aok_gen2)
 
     # ASUS Devices
     elif system_id in (
         "ROG Ally RC71L",
         "ROG Ally RC71L_RC71L",
     ):
-        handycon.system_type = "ALY_GEN1"
-        ally_gen1.init_handheld(handycon)
+        set_handheld("ALY_GEN1", ally_gen1)
 
     # Aya Neo Devices
     elif system_id in (
@@ -136,8 +136,7 @@ def id_system():
         "AYANEO 2021 Pro",
         "AYANEO 2021",
     ):
-        handycon.system_type = "AYA_GEN1"
-        aya_gen1.init_handheld(handycon)
+        set_handheld("AYA_GEN1", aya_gen1)
 
     elif system_id in (
         "AYANEO NEXT Advance",
@@ -148,34 +147,28 @@ def id_system():
         "NEXT Pro",
         "NEXT",
     ):
-        handycon.system_type = "AYA_GEN2"
-        aya_gen2.init_handheld(handycon)
+        set_handheld("AYA_GEN2", aya_gen2)
 
     elif system_id in (
         "AIR",
         "AIR Pro",
     ):
-        handycon.system_type = "AYA_GEN3"
-        aya_gen3.init_handheld(handycon)
+        set_handheld("AYA_GEN3", aya_gen3)
 
     elif system_id in (
         "AYANEO 2",
         "GEEK",
     ):
-        handycon.system_type = "AYA_GEN4"
-        aya_gen4.init_handheld(handycon)
+        set_handheld("AYA_GEN4", aya_gen4)
 
     elif system_id in ("AIR Plus",):
         if cpu_vendor == "GenuineIntel":
-            handycon.system_type = "AYA_GEN7"
-            aya_gen7.init_handheld(handycon)
+            set_handheld("AYA_GEN7", aya_gen7)
         else:
             if board_name == "AB05-Mendocino":
-                handycon.system_type = "AYA_GEN10"
-                aya_gen10.init_handheld(handycon)
+                set_handheld("AYA_GEN10", aya_gen10)
             else:
-                handycon.system_type = "AYA_GEN5"
-                aya_gen5.init_handheld(handycon)
+                set_handheld("AYA_GEN5", aya_gen5)
 
     elif system_id in (
         "AYANEO 2S",
@@ -185,62 +178,51 @@ def id_system():
         "AIR 1S",
         "AIR 1S Limited",
     ):
-        handycon.system_type = "AYA_GEN6"
-        aya_gen6.init_handheld(handycon)
+        set_handheld("AYA_GEN6", aya_gen6)
 
     elif system_id in ("KUN",):
-        handycon.system_type = "AYA_GEN8"
-        aya_gen8.init_handheld(handycon)
+        set_handheld("AYA_GEN8", aya_gen8)
 
     elif system_id in ("SLIDE",):
-        handycon.system_type = "AYA_GEN9"
-        aya_gen9.init_handheld(handycon)
+        set_handheld("AYA_GEN9", aya_gen9)
 
     # Ayn Devices
     elif system_id in ("Loki Max",):
-        handycon.system_type = "AYN_GEN1"
-        ayn_gen1.init_handheld(handycon)
+        set_handheld("AYN_GEN1", ayn_gen1)
 
     elif system_id in ("Loki Zero",):
-        handycon.system_type = "AYN_GEN2"
-        ayn_gen2.init_handheld(handycon)
+        set_handheld("AYN_GEN2", ayn_gen2)
 
     elif system_id in ("Loki MiniPro",):
-        handycon.system_type = "AYN_GEN3"
-        ayn_gen3.init_handheld(handycon)
+        set_handheld("AYN_GEN3", ayn_gen3)
 
     # Lenovo Devices
     elif system_id in (
         "83E1",  # Legion Go
     ):
-        handycon.system_type = "GO_GEN1"
-        go_gen1.init_handheld(handycon)
+        set_handheld("GO_GEN1", go_gen1)
 
     # GPD Devices
     # Have 2 buttons with 3 modes (left, right, both)
     elif system_id in (
         "G1618-03",  # Win3
     ):
-        handycon.system_type = "GPD_GEN1"
-        gpd_gen1.init_handheld(handycon)
+        set_handheld("GPD_GEN1", gpd_gen1)
 
     elif system_id in (
         "G1619-04",  # WinMax2
     ):
-        handycon.system_type = "GPD_GEN2"
-        gpd_gen2.init_handheld(handycon)
+        set_handheld("GPD_GEN2", gpd_gen2)
 
     elif system_id in (
         "G1618-04",  # Win4
     ):
-        handycon.system_type = "GPD_GEN3"
-        gpd_gen3.init_handheld(handycon)
+        set_handheld("GPD_GEN3", gpd_gen3)
 
     elif system_id in (
         "G1617-01",  # WinMini
     ):
-        handycon.system_type = "GPD_GEN4"
-        gpd_gen4.init_handheld(handycon)
+        set_handheld("GPD_GEN4", gpd_gen4)
 
     # ONEXPLAYER Devices
     # Older BIOS have incomlete DMI data and most models report as "ONE XPLAYER" or "ONEXPLAYER".
@@ -250,41 +232,34 @@ def id_system():
     ):
         # GEN 1
         if cpu_vendor == "GenuineIntel":
-            handycon.system_type = "OXP_GEN1"
-            oxp_gen1.init_handheld(handycon)
+            set_handheld("OXP_GEN1", oxp_gen1)
 
         # GEN 2
         else:
-            handycon.system_type = "OXP_GEN2"
-            oxp_gen2.init_handheld(handycon)
+            set_handheld("OXP_GEN2", oxp_gen2)
 
     # GEN 3
     elif system_id in ("ONEXPLAYER mini A07",):
-        handycon.system_type = "OXP_GEN3"
-        oxp_gen3.init_handheld(handycon)
+        set_handheld("OXP_GEN3", oxp_gen3)
 
     # GEN 4
     elif system_id in ("ONEXPLAYER Mini Pro",):
-        handycon.system_type = "OXP_GEN4"
-        oxp_gen4.init_handheld(handycon)
+        set_handheld("OXP_GEN4", oxp_gen4)
 
     # GEN 5
     elif system_id in ("ONEXPLAYER 2 ARP23",):
-        handycon.system_type = "OXP_GEN5"
-        oxp_gen5.init_handheld(handycon)
+        set_handheld("OXP_GEN5", oxp_gen5)
 
     # GEN 6
     elif system_id in (
         "ONEXPLAYER 2 PRO ARP23P",
         "ONEXPLAYER 2 PRO ARP23P EVA-01",
     ):
-        handycon.system_type = "OXP_GEN6"
-        oxp_gen6.init_handheld(handycon)
+        set_handheld("OXP_GEN6", oxp_gen6)
 
     # GEN 7
     elif system_id in ("ONEXPLAYER F1",):
-        handycon.system_type = "OXP_GEN7"
-        oxp_gen7.init_handheld(handycon)
+        set_handheld("OXP_GEN7", oxp_gen7)
 
     # Devices that aren't supported could cause issues, exit.
     else:
@@ -298,6 +273,16 @@ the file with your issue.")
     )
 
 
+# Binds the handheld module for the identified system. The module provides the
+# init_handheld and process_event functions used by the capture loops.
+def set_handheld(system_type, handheld):
+    global handycon
+
+    handycon.system_type = system_type
+    handycon.handheld = handheld
+    handheld.init_handheld(handycon)
+
+
 def get_cpu_vendor():
     global handycon
 
@@ -308,14 +293,21 @@ def get_cpu_vendor():
             return re.sub(".*vendor_id.*:", "", line, 1).strip()
 
 
-def get_config():
+# Reads the config file. A reload skips the startup settings, which the running
+# loops and passthrough thread were set up with.
+def get_config(reload=False):
     global handycon
     # Check for an existing config file and load it.
     handycon.config = configparser.ConfigParser()
     if os.path.exists(CONFIG_PATH):
         handycon.logger.info(f"Loading existing config: {CONFIG_PATH}")
         handycon.config.read(CONFIG_PATH)
-        if "version" not in handycon.config or float(handycon.config["version"]) < 1.2:
+        # The version is a key of [Button Map]. A current config is kept as
+        # written, so the read_backend chosen in [Input] survives a restart.
+        if (
+            "Button Map" not in handycon.config
+            or float(handycon.config["Button Map"].get("version", "0")) < 1.2
+        ):
             handycon.logger.info(
                 "Config file out of date. Generating new config.")
             set_default_config()
@@ -323,6 +315,8 @@ def get_config():
     else:
         set_default_config()
         write_config()
+    if not reload:
+        map_startup_config()
     map_config()
 
 
@@ -330,20 +324,154 @@ def get_config():
 def map_config():
     # Assign config file values
     handycon.button_map = {
-        "button1": EVENT_MAP[handycon.config["Button Map"]["button1"]],
-        "button2": EVENT_MAP[handycon.config["Button Map"]["button2"]],
-        "button3": EVENT_MAP[handycon.config["Button Map"]["button3"]],
-        "button4": EVENT_MAP[handycon.config["Button Map"]["button4"]],
-        "button5": EVENT_MAP[handycon.config["Button Map"]["button5"]],
-        "button6": EVENT_MAP[handycon.config["Button Map"]["button6"]],
-        "button7": EVENT_MAP[handycon.config["Button Map"]["button7"]],
-        "button8": EVENT_MAP[handycon.config["Button Map"]["button8"]],
-        "button9": EVENT_MAP[handycon.config["Button Map"]["button9"]],
+        "button1": ACTION_MAP[handycon.config["Button Map"]["button1"]],
+        "button2": ACTION_MAP[handycon.config["Button Map"]["button2"]],
+        "button3": ACTION_MAP[handycon.config["Button Map"]["button3"]],
+        "button4": ACTION_MAP[handycon.config["Button Map"]["button4"]],
+        "button5": ACTION_MAP[handycon.config["Button Map"]["button5"]],
+        "button6": ACTION_MAP[handycon.config["Button Map"]["button6"]],
+        "button7": ACTION_MAP[handycon.config["Button Map"]["button7"]],
+        "button8": ACTION_MAP[handycon.config["Button Map"]["button8"]],
+        "button9": ACTION_MAP[handycon.config["Button Map"]["button9"]],
     }
     handycon.power_action = POWER_ACTION_MAP[
         handycon.config["Button Map"]["power_button"]
     ][0]
 
+    # Enabling clears the ring, so a reload only does it when tracing was off.
+    if not handycon.config.getboolean("Input", "trace", fallback=False):
+        tracing.disable()
+    elif not tracing.enabled:
+        tracing.enable()
+
+    # Axis curves are compiled into lookup tables by curves.build_tables.
+    handycon.stick_curves = {}
+    for stick in curves.STICKS:
+        try:
+            handycon.stick_curves[stick] = curves.read_curve(
+                handycon.config, "Sticks", stick
+            )
+        except ValueError as err:
+            handycon.logger.warn(f"{err} | Invalid {stick} stick curve. Using linear.")
+            handycon.stick_curves[stick] = curves.Curve()
+    handycon.trigger_curves = {}
+    latches = {}
+    for trigger, axis in curves.TRIGGERS.items():
+        try:
+            handycon.trigger_curves[trigger] = curves.read_curve(
+                handycon.config, "Triggers", trigger, "saturation"
+            )
+        except ValueError as err:
+            handycon.logger.warn(
+                f"{err} | Invalid {trigger} trigger curve. Using linear."
+            )
+            handycon.trigger_curves[trigger] = curves.Curve()
+        try:
+            latch = curves.read_latch(handycon.config, trigger)
+        except ValueError as err:
+            handycon.logger.warn(f"{err} | Invalid {trigger} trigger mode. Using analog.")
+            latch = None
+        if latch:
+            latches[axis] = latch
+    update_trigger_latches(latches)
+
+    # Gamepad buttons are mapped by BTN_* or KEY_* name to a button of the
+    # virtual controller.
+    remap = {}
+    if "Gamepad Map" in handycon.config:
+        for name, target in handycon.config["Gamepad Map"].items():
+            code = e.ecodes.get(name.upper())
+            new_code = e.ecodes.get(target.strip().upper())
+            if not name.upper().startswith(("BTN_", "KEY_")) or code is None:
+                handycon.logger.warn(f"{name} is not a gamepad button. Remap ignored.")
+                continue
+            if new_code not in CONTROLLER_EVENTS[e.EV_KEY]:
+                handycon.logger.warn(f"{target} is not a controller button. Remap ignored.")
+                continue
+            remap[code] = new_code
+    update_controller_remap(remap)
+
+
+# Match the [Input] and [Turbo] settings to the config. They choose how devices
+# are read and forwarded, so they only apply at startup.
+def map_startup_config():
+    global handycon
+    # Input settings were added after config version 1.2, so fall back to the
+    # defaults when an older config doesn't have them.
+    handycon.io_backend = handycon.config.get("Input", "io_backend", fallback="asyncio")
+    handycon.read_backend = handycon.config.get(
+        "Input", "read_backend", fallback="raw"
+    )
+    handycon.realtime_thread = handycon.config.getboolean(
+        "Input", "realtime_thread", fallback=False
+    )
+    handycon.realtime_priority = handycon.config.getint(
+        "Input", "realtime_priority", fallback=10
+    )
+    cpus = handycon.config.get("Input", "realtime_cpus", fallback="")
+    handycon.realtime_cpus = {int(cpu) for cpu in cpus.split(",") if cpu.strip()}
+    handycon.lock_memory = handycon.config.getboolean(
+        "Input", "lock_memory", fallback=True
+    )
+    handycon.measure_latency = handycon.config.getboolean(
+        "Input", "latency", fallback=False
+    )
+    # Analog stick motion is written at most this many times a second. 0 writes
+    # every frame.
+    handycon.coalesce_rate = handycon.config.getfloat(
+        "Input", "coalesce_rate", fallback=0
+    )
+    # Event loop stalls longer than this many milliseconds are reported. 0 turns
+    # the lag monitor off.
+    handycon.lag_threshold = handycon.config.getfloat(
+        "Input", "lag_threshold", fallback=0
+    )
+    # Turbo buttons are BTN_* names of the virtual controller's buttons.
+    handycon.turbo_buttons = []
+    for name in handycon.config.get("Turbo", "buttons", fallback="").split():
+        code = e.ecodes.get(name)
+        if not name.startswith("BTN_") or code not in CONTROLLER_EVENTS[e.EV_KEY]:
+            handycon.logger.warn(f"{name} is not a controller button. Turbo ignored.")
+            continue
+        handycon.turbo_buttons.append(code)
+    handycon.turbo_rate = handycon.config.getfloat("Turbo", "rate", fallback=10)
+
+
+# Compiles the gamepad remap into a dense array of output codes indexed by input
+# code. Without any mapping there is no array and buttons take the fast path. An
+# existing array is updated in place, a new one is handed to the passthrough
+# thread.
+def update_controller_remap(remap):
+    global handycon
+    if not remap and not handycon.controller_remap:
+        return
+    table = array("H", range(e.KEY_CNT))
+    for code, new_code in remap.items():
+        table[code] = new_code
+    if handycon.controller_remap:
+        handycon.controller_remap[:] = table
+        return
+    handycon.controller_remap = table
+    if handycon.passthrough_thread:
+        handycon.passthrough_thread.remap = table
+
+
+# Swaps in freshly built axis tables. The dicts shared with the passthrough
+# thread are replaced whole and never edited, so it sees either the old or the
+# new set.
+def update_axis_tables(tables):
+    global handycon
+    handycon.axis_tables = tables
+    if handycon.passthrough_thread:
+        handycon.passthrough_thread.tables = tables
+
+
+def update_trigger_latches(latches):
+    global handycon
+    handycon.trigger_latches = latches
+    if handycon.passthrough_thread:
+        handycon.passthrough_thread.latches = latches
+
 
 # Sets the default configuration.
 def set_default_config():
@@ -361,6 +489,49 @@ def set_default_config():
         "button9": "THUMBR",
         "power_button": "SUSPEND",
     }
+    handycon.config["Input"] = {
+        "io_backend": "asyncio",
+        "read_backend": "raw",
+        "realtime_thread": "false",
+        "realtime_priority": "10",
+        "realtime_cpus": "",
+        "lock_memory": "true",
+        "trace": "false",
+        "latency": "false",
+        "lag_threshold": "0",
+        "coalesce_rate": "0",
+    }
+    handycon.config["Turbo"] = {
+        "buttons": "",
+        "rate": "10",
+    }
+    handycon.config["Sticks"] = {
+        "left_curve": "linear",
+        "left_exponent": "2",
+        "left_deadzone": "0",
+        "left_outer_deadzone": "0",
+        "right_curve": "linear",
+        "right_exponent": "2",
+        "right_deadzone": "0",
+        "right_outer_deadzone": "0",
+    }
+    handycon.config["Gamepad Map"] = {}
+    handycon.config["Triggers"] = {
+        "left_curve": "linear",
+        "left_exponent": "2",
+        "left_deadzone": "0",
+        "left_saturation": "0",
+        "left_mode": "analog",
+        "left_press": "0.5",
+        "left_release": "0.4",
+        "right_curve": "linear",
+        "right_exponent": "2",
+        "right_deadzone": "0",
+        "right_saturation": "0",
+        "right_mode": "analog",
+        "right_press": "0.5",
+        "right_release": "0.4",
+    }
 
 
 # Writes current config to disk.
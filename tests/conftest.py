@@ -0,0 +1,135 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import logging
+import os
+import pytest
+
+# Local modules
+from handycon import deviceindex
+from handycon import devices
+
+# Partial imports
+from types import SimpleNamespace
+
+GAMEPAD_NAME = "Microsoft X-Box 360 pad"
+GAMEPAD_PHYS = "usb-0000:03:00.3-3/input0"
+
+
+# A fake /sys/class/input and /dev/input. plug() creates the sysfs attributes
+# of an event node the way the kernel does, optionally below a USB interface,
+# and the node itself as a regular file that can be opened.
+class InputTree:
+    def __init__(self, root):
+        self.root = root
+        self.sys_input = root / "sys"
+        self.dev_input = root / "dev"
+        self.hide = root / "hide"
+        for path in (self.sys_input, self.dev_input, self.hide):
+            path.mkdir()
+        self.devices = {}  # Node path -> (name, phys)
+
+    def plug(
+        self,
+        number,
+        name,
+        phys,
+        vendor=0x045E,
+        product=0x028E,
+        interface=None,
+        removable=False,
+    ):
+        if interface is None:
+            device = self.root / "devices" / f"input{number}"
+        else:
+            port = self.root / "devices" / f"usb{number}"
+            usb = port / f"usb{number}:1.{interface}"
+            usb.mkdir(parents=True)
+            (port / "removable").write_text("removable\n" if removable else "fixed\n")
+            (usb / "bInterfaceNumber").write_text(f"{interface:02x}\n")
+            device = usb / f"input{number}"
+        (device / "id").mkdir(parents=True)
+        (device / "name").write_text(name + "\n")
+        (device / "phys").write_text(phys + "\n")
+        (device / "id" / "vendor").write_text(f"{vendor:04x}\n")
+        (device / "id" / "product").write_text(f"{product:04x}\n")
+        (self.sys_input / f"event{number}").mkdir()
+        os.symlink(device, self.sys_input / f"event{number}" / "device")
+        path = self.dev_input / f"event{number}"
+        path.touch()
+        self.devices[str(path)] = (name, phys)
+        return f"event{number}"
+
+    # The kernel creates the node again when a grabbed device reconnects.
+    def replug(self, event):
+        (self.dev_input / event).touch()
+
+    def unplug(self, event):
+        (self.sys_input / event / "device").unlink()
+        (self.sys_input / event).rmdir()
+        path = self.dev_input / event
+        if path.exists():
+            path.unlink()
+
+    def index(self):
+        return deviceindex.DeviceIndex(str(self.sys_input), str(self.dev_input))
+
+
+# Stands in for evdev.InputDevice. It holds a real fd, so leaks show up in the
+# fd count, and counts how many nodes were opened.
+class FakeDevice:
+    opens = 0
+    tree = None
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        FakeDevice.opens += 1
+        self.path = path
+        self.name, self.phys = self.tree.devices[path]
+
+    def grab(self):
+        pass
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+@pytest.fixture
+def input_tree(tmp_path):
+    return InputTree(tmp_path)
+
+
+# Points devices at the fake input tree with a minimal controller in place of
+# handycon.HandheldController.
+@pytest.fixture
+def fake_devices(input_tree, monkeypatch):
+    monkeypatch.setattr(FakeDevice, "tree", input_tree)
+    monkeypatch.setattr(FakeDevice, "opens", 0)
+    monkeypatch.setattr(devices, "InputDevice", FakeDevice)
+    monkeypatch.setattr(devices, "HIDE_PATH", input_tree.hide)
+    handycon = SimpleNamespace(
+        logger=logging.getLogger("handycon"),
+        device_index=input_tree.index(),
+        GAMEPAD_NAME=GAMEPAD_NAME,
+        GAMEPAD_ADDRESS=GAMEPAD_PHYS,
+        GAMEPAD_USB=[],
+        KEYBOARD_NAME="AT Translated Set 2 keyboard",
+        KEYBOARD_ADDRESS="isa0060/serio0/input0",
+        KEYBOARD_USB=[],
+        KEYBOARD_2_NAME="",
+        KEYBOARD_2_ADDRESS="",
+        KEYBOARD_2_USB=[],
+        CAPTURE_CONTROLLER=True,
+        controller_device=None,
+        controller_event=None,
+        controller_latency=None,
+        controller_path=None,
+        measure_latency=False,
+        turbo=None,
+        coalescer=None,
+    )
+    monkeypatch.setattr(devices, "handycon", handycon)
+    return handycon
@@ -0,0 +1,222 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import importlib
+import pytest
+import random
+
+# Local modules
+from handycon import actions
+from handycon import chords
+from handycon import devices
+from handycon.actions import ACTION_MAP, InputSource, events
+from handycon.constants import EVENT_ESC, EVENT_MAP, EVENT_MODE
+from handycon.keystate import keys_to_mask
+
+# Partial imports
+from evdev import InputEvent, ecodes as e
+
+HANDHELDS = [
+    "ally_gen1",
+    "anb_gen1",
+    "aok_gen1",
+    "aok_gen2",
+    "aya_gen1",
+    "aya_gen2",
+    "aya_gen3",
+    "aya_gen4",
+    "aya_gen5",
+    "aya_gen6",
+    "aya_gen7",
+    "aya_gen8",
+    "aya_gen9",
+    "aya_gen10",
+    "ayn_gen1",
+    "ayn_gen2",
+    "ayn_gen3",
+    "go_gen1",
+    "gpd_gen1",
+    "gpd_gen2",
+    "gpd_gen3",
+    "gpd_gen4",
+    "oxp_gen1",
+    "oxp_gen2",
+    "oxp_gen3",
+    "oxp_gen4",
+    "oxp_gen5",
+    "oxp_gen6",
+    "oxp_gen7",
+]
+BUTTON_MAP = {
+    "button1": "SCR",
+    "button2": "QAM",
+    "button3": "ESC",
+    "button4": "OSK",
+    "button5": "MODE",
+    "button6": "OPEN_CHIMERA",
+    "button7": "TOGGLE_PERFORMANCE",
+    "button8": "THUMBL",
+    "button9": "THUMBR",
+}
+
+
+# Records what the chord tables emit in place of handycon.HandheldController.
+class FakeController:
+    def __init__(self):
+        self.button_map = {
+            button: ACTION_MAP[name] for button, name in BUTTON_MAP.items()
+        }
+        self.emitted = []
+        self.timers = self
+        self.LONG_PRESS_DELAY = 0.5
+
+    def call_later(self, delay, callback, *args):
+        return asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    def emit_event(self, event):
+        self.emitted.append((event.code, event.value))
+
+    async def emit_now(self, seed_event, event_list, value, source=None):
+        self.emitted.append((event_list, value))
+
+    async def do_rumble(self, *args):
+        pass
+
+    async def handle_key_down(self, seed_event, source, action):
+        await devices.handle_key_down(seed_event, source, action)
+
+    async def handle_key_up(self, seed_event, source, action):
+        await devices.handle_key_up(seed_event, source, action)
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = FakeController()
+    monkeypatch.setattr(chords, "handycon", controller)
+    monkeypatch.setattr(devices, "handycon", controller)
+    return controller
+
+
+# Feeds key presses and releases through a chord table, tracking the held keys
+# like the capture loops do.
+def play(table, source, keys):
+    async def run():
+        active = set()
+        for code, value in keys:
+            if value:
+                active.add(code)
+            else:
+                active.discard(code)
+            seed_event = InputEvent(0, 0, e.EV_KEY, code, value)
+            await table.process(seed_event, keys_to_mask(active), source)
+
+    asyncio.run(run())
+
+
+def press(*codes):
+    return [(code, 1) for code in codes]
+
+
+def release(*codes):
+    return [(code, 0) for code in codes]
+
+
+def test_equal_event_lists_share_an_action():
+    action = actions.intern([list(item) for item in EVENT_ESC])
+    assert action == ACTION_MAP["ESC"]
+    assert events(action) == EVENT_ESC
+    assert len(set(ACTION_MAP.values())) == len(
+        {str(event_list) for event_list in EVENT_MAP.values()}
+    )
+    assert ACTION_MAP["MODE"] in actions.INSTANT_ACTIONS
+    assert ACTION_MAP["ESC"] in actions.QUEUED_ACTIONS
+
+
+def test_queued_chord_fires_on_release(controller):
+    table = importlib.import_module("handycon.handhelds.oxp_gen4").CHORD_TABLE
+    source = InputSource("keyboard")
+    play(table, source, press(97, 100, 111))
+    assert controller.emitted == []
+    assert list(source.event_queue) == [ACTION_MAP["ESC"]]
+
+    play(table, source, release(100, 111, 97))
+    assert controller.emitted == [(EVENT_ESC, 1), (EVENT_ESC, 0)]
+    assert not source.event_queue
+    assert source.last_button is None
+
+
+def test_instant_chord_fires_on_press(controller):
+    table = importlib.import_module("handycon.handhelds.aya_gen5").CHORD_TABLE
+    source = InputSource("keyboard")
+    play(table, source, press(29, 125, 187))
+    assert controller.emitted == [(EVENT_MODE, 1)]
+
+    play(table, source, release(187, 125, 29))
+    assert controller.emitted == [(EVENT_MODE, 1), (EVENT_MODE, 0)]
+    assert not source.event_queue
+
+
+# A KEY chord in a queued table, such as the Ally's paddles, is released by
+# handle_key_up and isn't fired again as a missed key.
+def test_key_chord_in_queued_table(controller):
+    table = importlib.import_module("handycon.handhelds.ally_gen1").CHORD_TABLE
+    source = InputSource("keyboard")
+    play(table, source, press(184) + release(184))
+
+    thumbl = events(ACTION_MAP["THUMBL"])
+    assert controller.emitted == [(thumbl, 1), (thumbl, 0)]
+    assert not source.event_queue
+    assert source.last_button is None
+
+
+def test_sources_keep_their_own_queue(controller):
+    table = importlib.import_module("handycon.handhelds.oxp_gen4").CHORD_TABLE
+    keyboard = InputSource("keyboard")
+    keyboard_2 = InputSource("keyboard_2")
+    play(table, keyboard, press(97, 100, 111))
+    play(table, keyboard_2, press(1) + release(1))
+
+    assert controller.emitted == []
+    assert list(keyboard.event_queue) == [ACTION_MAP["ESC"]]
+    assert not keyboard_2.event_queue
+
+
+def test_passthrough_keys_are_emitted(controller):
+    table = importlib.import_module("handycon.handhelds.oxp_gen4").CHORD_TABLE
+    source = InputSource("keyboard")
+    play(table, source, press(e.KEY_VOLUMEUP) + release(e.KEY_VOLUMEUP))
+    assert controller.emitted == [(e.KEY_VOLUMEUP, 1), (e.KEY_VOLUMEUP, 0)]
+
+
+# Presses every chord of a table among random other keys, with repeats.
+def chord_stream(table, count, seed):
+    generator = random.Random(seed)
+    presses = [
+        [code for code in range(e.KEY_MAX) if keys >> code & 1]
+        for chord in table.chords
+        for keys in chord.press
+    ]
+    stream = []
+    for _ in range(count):
+        if generator.random() < 0.9:
+            keys = generator.choice(presses)
+        else:
+            keys = generator.sample(range(1, 200), generator.randint(1, 3))
+        stream += press(*keys)
+        if generator.random() < 0.2:
+            stream.append((keys[-1], 2))
+        stream += release(*keys)
+    return stream
+
+
+# Every chord of every handheld, pressed and released among other keys, is
+# processed without errors and leaves nothing pending.
+@pytest.mark.parametrize("name", HANDHELDS)
+def test_chord_stream(controller, name):
+    table = importlib.import_module(f"handycon.handhelds.{name}").CHORD_TABLE
+    source = InputSource("keyboard")
+    play(table, source, chord_stream(table, 2000, 1))
+
+    assert len(source.event_queue) <= len(table.chords)
@@ -0,0 +1,99 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import logging
+import pytest
+
+# Local modules
+from handycon import utilities
+from handycon.actions import ACTION_MAP
+
+# Partial imports
+from evdev import ecodes as e
+from types import SimpleNamespace
+
+CONFIG = """
+[Button Map]
+version = 1.2
+button1 = {button1}
+button2 = QAM
+button3 = ESC
+button4 = OSK
+button5 = MODE
+button6 = OPEN_CHIMERA
+button7 = TOGGLE_PERFORMANCE
+button8 = THUMBL
+button9 = THUMBR
+power_button = SUSPEND
+
+[Input]
+read_backend = {read_backend}
+realtime_thread = {realtime_thread}
+latency = {realtime_thread}
+
+[Turbo]
+buttons = {turbo}
+"""
+
+
+# Points utilities at a config file in tmp_path.
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    path = tmp_path / "handygccs.conf"
+    monkeypatch.setattr(utilities, "CONFIG_PATH", str(path))
+    return path
+
+
+# A minimal controller in place of handycon.HandheldController.
+@pytest.fixture
+def controller(monkeypatch):
+    controller = SimpleNamespace(
+        logger=logging.getLogger("handycon"),
+        controller_remap=None,
+        passthrough_thread=None,
+    )
+    monkeypatch.setattr(utilities, "handycon", controller)
+    return controller
+
+
+# The [Input] and [Turbo] settings the loops were started with stay in place on
+# reload, while the button map follows the file.
+def test_reload_keeps_startup_settings(config_path, controller):
+    config_path.write_text(
+        CONFIG.format(
+            button1="SCR", read_backend="raw", realtime_thread=False, turbo=""
+        )
+    )
+    utilities.get_config()
+
+    config_path.write_text(
+        CONFIG.format(
+            button1="ESC", read_backend="evdev", realtime_thread=True, turbo="BTN_SOUTH"
+        )
+    )
+    utilities.get_config(reload=True)
+    assert controller.button_map["button1"] == ACTION_MAP["ESC"]
+    assert controller.read_backend == "raw"
+    assert not controller.realtime_thread
+    assert not controller.measure_latency
+    assert controller.turbo_buttons == []
+
+    utilities.get_config()
+    assert controller.read_backend == "evdev"
+    assert controller.realtime_thread
+    assert controller.turbo_buttons == [e.BTN_SOUTH]
+
+
+# A config at version 1.2 is kept on startup rather than regenerated, so the
+# read backend chosen in [Input] is used.
+def test_startup_keeps_current_config(config_path, controller):
+    config = CONFIG.format(
+        button1="ESC", read_backend="evdev", realtime_thread=False, turbo=""
+    )
+    config_path.write_text(config)
+    utilities.get_config()
+
+    assert config_path.read_text() == config
+    assert controller.read_backend == "evdev"
+    assert controller.button_map["button1"] == ACTION_MAP["ESC"]
@@ -0,0 +1,149 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import os
+
+# Local modules
+from handycon import devices
+
+# Partial imports
+from conftest import GAMEPAD_NAME, GAMEPAD_PHYS, FakeDevice
+
+RECONNECTS = 200
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def plug_others(input_tree, count=40):
+    for number in range(count):
+        input_tree.plug(number, f"Other device {number}", f"phys{number}", product=number)
+
+
+def test_find_by_address_and_id(input_tree):
+    plug_others(input_tree, 3)
+    input_tree.plug(7, GAMEPAD_NAME, GAMEPAD_PHYS)
+    index = input_tree.index()
+    index.refresh()
+
+    assert len(index) == 4
+    info = index.find(GAMEPAD_NAME, GAMEPAD_PHYS)
+    assert info.event == "event7"
+    assert info.path == str(input_tree.dev_input / "event7")
+    assert index.find(GAMEPAD_NAME, "phys0") is None
+    assert [info.event for info in index.find_id(0x045E, 0x028E)] == ["event7"]
+
+
+def test_refresh_reads_only_new_nodes(input_tree):
+    plug_others(input_tree, 5)
+    index = input_tree.index()
+    index.refresh()
+    assert index.reads == 5
+
+    index.refresh()
+    assert index.reads == 5
+
+    input_tree.plug(9, GAMEPAD_NAME, GAMEPAD_PHYS)
+    input_tree.unplug("event0")
+    index.refresh()
+    assert index.reads == 6
+    assert "event0" not in index.devices
+    assert index.find(GAMEPAD_NAME, GAMEPAD_PHYS).event == "event9"
+    assert index.find("Other device 0", "phys0") is None
+
+
+def test_role_prefers_the_known_phys(input_tree):
+    candidates = [(0x045E, 0x028E, 0)]
+    input_tree.plug(3, GAMEPAD_NAME, "usb-external/input0", interface=0)
+    input_tree.plug(5, GAMEPAD_NAME, GAMEPAD_PHYS, interface=0)
+    index = input_tree.index()
+    index.refresh()
+    index.set_role("controller", GAMEPAD_NAME, candidates)
+
+    assert index.find_role("controller", GAMEPAD_PHYS).event == "event5"
+    assert index.find_role("controller", "usb-moved/input0").event == "event3"
+    assert index.find_role("controller").event == "event3"
+
+
+def test_role_skips_removable_ports(input_tree):
+    input_tree.plug(3, GAMEPAD_NAME, "usb-external/input0", interface=0, removable=True)
+    index = input_tree.index()
+    index.refresh()
+    index.set_role("controller", GAMEPAD_NAME, [(0x045E, 0x028E, 0)])
+
+    assert index.find_role("controller") is None
+
+
+def test_role_matches_nodes_added_later(input_tree):
+    index = input_tree.index()
+    index.refresh()
+    index.set_role("controller", GAMEPAD_NAME, [(0x045E, 0x028E, 0)])
+    input_tree.plug(4, GAMEPAD_NAME, "usb-moved/input0", interface=0)
+    index.add("event4")
+
+    assert index.find_role("controller").event == "event4"
+    index.remove("event4")
+    assert index.find_role("controller") is None
+
+
+# Firmware updates renumber the bus in phys. The 360 pad is still found by its
+# IDs and the interface its profile's phys ends with.
+def test_controller_found_after_bus_renumbering(input_tree, fake_devices):
+    input_tree.plug(3, "Other device", "usb-0000:04:00.3-3/input1", interface=1)
+    input_tree.plug(5, GAMEPAD_NAME, "usb-0000:04:00.3-3/input0", interface=0)
+    devices.set_device_roles()
+
+    assert devices.get_controller()
+    assert fake_devices.controller_device.path.endswith("event5")
+    devices.release_controller()
+
+
+# Devices without listed or known IDs take those of the node at the profile's
+# phys, so they are found again if their bus is renumbered later.
+def test_roles_learn_ids_from_phys(input_tree, fake_devices):
+    name, phys = "Mouse for Windows", "usb-0000:74:00.3-4/input0"
+    input_tree.plug(2, name, phys, vendor=0x2F24, product=0x0135, interface=0)
+    fake_devices.KEYBOARD_NAME = name
+    fake_devices.KEYBOARD_ADDRESS = phys
+    devices.set_device_roles()
+    input_tree.unplug("event2")
+    input_tree.plug(
+        7, name, "usb-0000:75:00.3-4/input0", vendor=0x2F24, product=0x0135, interface=0
+    )
+
+    device = devices.open_device(name, phys, "keyboard")
+    assert device.path.endswith("event7")
+    devices.close_device(device)
+
+
+# Every reconnect used to open all event nodes and leak the ones that didn't
+# match. Now only the controller's node is opened and closed again on release.
+def test_reconnects_keep_fd_count_flat(input_tree, fake_devices):
+    plug_others(input_tree)
+    event = input_tree.plug(40, GAMEPAD_NAME, GAMEPAD_PHYS)
+
+    assert devices.get_controller()
+    devices.release_controller()
+    input_tree.replug(event)
+    before = open_fds()
+    FakeDevice.opens = 0
+
+    for _ in range(RECONNECTS):
+        assert devices.get_controller()
+        assert fake_devices.controller_device.name == GAMEPAD_NAME
+        devices.release_controller()
+        input_tree.replug(event)
+
+    assert open_fds() == before
+    assert FakeDevice.opens == RECONNECTS
+    assert fake_devices.device_index.reads == 41
+
+
+def test_missing_controller_opens_nothing(input_tree, fake_devices):
+    plug_others(input_tree)
+
+    assert not devices.get_controller()
+    assert FakeDevice.opens == 0
+    assert fake_devices.controller_device is None
@@ -0,0 +1,145 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import logging
+import pytest
+import socket
+
+# Local modules
+from handycon import devices
+from handycon import hotplug
+from handycon import procdevices
+
+# Partial imports
+from conftest import GAMEPAD_NAME, GAMEPAD_PHYS
+
+
+def uevent(action, event, subsystem="input"):
+    devpath = f"/devices/virtual/input/input99/{event}"
+    fields = [
+        f"{action}@{devpath}",
+        f"ACTION={action}",
+        f"DEVPATH={devpath}",
+        f"SUBSYSTEM={subsystem}",
+        f"DEVNAME=input/{event}",
+        "SEQNUM=1",
+    ]
+    return "\0".join(fields).encode() + b"\0"
+
+
+def make_monitor(loop, input_tree, tmp_path):
+    index = input_tree.index()
+    index.refresh()
+    proc_devices = procdevices.ProcDevices(str(tmp_path / "devices"))
+    return hotplug.HotplugMonitor(
+        loop, logging.getLogger("handycon"), index, proc_devices, 0.01
+    )
+
+
+def test_add_wakes_only_matching_waiters(input_tree, tmp_path):
+    loop = asyncio.new_event_loop()
+    monitor = make_monitor(loop, input_tree, tmp_path)
+    monitor.sock = object()  # Waiters queue as if uevents arrive.
+    woken = []
+    monitor.notify(lambda: woken.append("controller"), (GAMEPAD_NAME, GAMEPAD_PHYS))
+    monitor.notify(lambda: woken.append("keyboard"), ("Keyboard", "isa0060"))
+
+    input_tree.plug(3, "Other device", "phys3")
+    monitor.handle(uevent("add", "event3"))
+    assert woken == []
+
+    input_tree.plug(4, GAMEPAD_NAME, GAMEPAD_PHYS)
+    monitor.handle(uevent("add", "event4"))
+    assert woken == ["controller"]
+    assert monitor.index.find(GAMEPAD_NAME, GAMEPAD_PHYS).event == "event4"
+    assert len(monitor.waiters) == 1
+    assert monitor.uevents == 2
+    assert monitor.wakeups == 1
+    loop.close()
+
+
+# The woken waiter opens the node by its role, though the bus in its phys has
+# been renumbered.
+def test_add_wakes_role_waiters(input_tree, fake_devices, tmp_path):
+    loop = asyncio.new_event_loop()
+    monitor = make_monitor(loop, input_tree, tmp_path)
+    monitor.index = fake_devices.device_index
+    monitor.sock = object()
+    devices.set_device_roles()
+    opened = []
+
+    def attach():
+        device = devices.open_device(GAMEPAD_NAME, GAMEPAD_PHYS, "controller")
+        opened.append(device.path)
+        devices.close_device(device)
+
+    monitor.notify(attach, "controller")
+    input_tree.plug(4, GAMEPAD_NAME, "usb-0000:04:00.3-3/input0", interface=0)
+    monitor.handle(uevent("add", "event4"))
+    assert opened == [str(input_tree.dev_input / "event4")]
+    loop.close()
+
+
+def test_remove_and_other_uevents(input_tree, tmp_path):
+    loop = asyncio.new_event_loop()
+    monitor = make_monitor(loop, input_tree, tmp_path)
+    event = input_tree.plug(4, GAMEPAD_NAME, GAMEPAD_PHYS)
+    monitor.handle(uevent("add", event))
+    monitor.proc_devices.devices = []
+
+    monitor.handle(uevent("add", "hidraw0", subsystem="hidraw"))
+    assert monitor.proc_devices.devices == []
+    assert monitor.uevents == 1
+
+    monitor.handle(uevent("remove", event))
+    assert monitor.proc_devices.devices is None
+    assert monitor.index.find(GAMEPAD_NAME, GAMEPAD_PHYS) is None
+    assert monitor.uevents == 2
+    loop.close()
+
+
+# Without a uevent socket, waiters are called back after the delay, as when the
+# loops polled for their devices.
+def test_wait_without_socket_falls_back_to_delay(input_tree, tmp_path):
+    async def wait():
+        loop = asyncio.get_running_loop()
+        monitor = make_monitor(loop, input_tree, tmp_path)
+        start = loop.time()
+        await monitor.wait((GAMEPAD_NAME, GAMEPAD_PHYS))
+        return loop.time() - start
+
+    assert asyncio.run(wait()) >= 0.01
+
+
+# Sends the uevent on the kernel group, which needs CAP_NET_ADMIN.
+def test_wait_returns_on_kernel_uevent(input_tree, tmp_path):
+    async def wait():
+        loop = asyncio.get_running_loop()
+        monitor = make_monitor(loop, input_tree, tmp_path)
+        monitor.start()
+        if not monitor.sock:
+            pytest.skip("Unable to open a uevent socket.")
+        try:
+            sender = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_DGRAM, hotplug.NETLINK_KOBJECT_UEVENT
+            )
+        except OSError:
+            monitor.stop()
+            pytest.skip("Unable to open a uevent socket.")
+        waiter = asyncio.ensure_future(monitor.wait((GAMEPAD_NAME, GAMEPAD_PHYS)))
+        await asyncio.sleep(0)
+        input_tree.plug(42, GAMEPAD_NAME, GAMEPAD_PHYS)
+        try:
+            with sender:
+                sender.bind((0, 0))
+                sender.sendto(uevent("add", "event42"), (0, hotplug.KERNEL_EVENTS))
+        except PermissionError:
+            monitor.stop()
+            pytest.skip("Not permitted to send to the kernel uevent group.")
+        await asyncio.wait_for(waiter, 5)
+        monitor.stop()
+        return monitor.wakeups
+
+    assert asyncio.run(wait()) == 1
@@ -0,0 +1,302 @@
+# This file is part of Handheld Game Console Controller System (HandyGCCS)
+# Copyright 2022-2023 Derek J. Clark <derekjohn.clark@gmail.com>
+
+# Python Modules
+import asyncio
+import logging
+import os
+import pytest
+import select
+import time
+
+# Local modules
+from handycon import devices
+from handycon import hotplug
+from handycon import procdevices
+from handycon import utilities
+from handycon.constants import EVENT_STRUCT
+from handycon.latency import LatencyHistogram
+from handycon.rawinput import RawReader
+from handycon.realtime import PassthroughThread
+
+# Partial imports
+from array import array
+from conftest import GAMEPAD_NAME, GAMEPAD_PHYS
+from evdev import ecodes as e
+from types import SimpleNamespace
+
+# Stick frames are fed this often while the keyboard is missing.
+FEED_PERIOD = 0.002
+FEED_TIME = 1.0
+# Failed keyboard scans are retried this often, much more often than the
+# DETECT_DELAY a blocking scan used to stall the loop for.
+RETRY_DELAY = 0.01
+# LatencyHistogram records microseconds.
+MAX_P99_US = 10_000
+MAX_LATENCY_US = 50_000
+
+
+# A controller read from one pipe and a virtual device written to another.
+class Pipes:
+    def __init__(self):
+        self.controller, self.feed = os.pipe()
+        self.output, self.ui_fd = os.pipe()
+        os.set_blocking(self.controller, False)
+        os.set_blocking(self.output, False)
+
+    def write(self, records):
+        os.write(self.feed, b"".join(EVENT_STRUCT.pack(*record) for record in records))
+
+    # Returns the (type, code, value) of the records written to the virtual
+    # device, waiting up to timeout seconds for the first.
+    def read(self, timeout=0):
+        select.select([self.output], [], [], timeout)
+        try:
+            data = os.read(self.output, 1 << 16)
+        except BlockingIOError:
+            return []
+        return [record[2:] for record in EVENT_STRUCT.iter_unpack(data)]
+
+    def close(self):
+        for fd in (self.controller, self.feed, self.output, self.ui_fd):
+            os.close(fd)
+
+
+@pytest.fixture
+def pipes():
+    pipes = Pipes()
+    yield pipes
+    pipes.close()
+
+
+def swap_face_buttons():
+    remap = array("H", range(e.KEY_CNT))
+    remap[e.BTN_SOUTH] = e.BTN_EAST
+    remap[e.BTN_EAST] = e.BTN_SOUTH
+    return remap
+
+
+def button_frame(code, value):
+    return [
+        (1, 2, e.EV_MSC, e.MSC_SCAN, 589825),
+        (1, 2, e.EV_KEY, code, value),
+        (1, 2, e.EV_ABS, e.ABS_X, 100),
+        (1, 2, e.EV_SYN, e.SYN_REPORT, 0),
+    ]
+
+
+def passthrough_controller(pipes, remap):
+    return SimpleNamespace(
+        turbo=None,
+        coalescer=None,
+        axis_tables={},
+        trigger_latches={},
+        controller_remap=remap,
+        controller_latency=None,
+        ui_device=SimpleNamespace(fd=pipes.ui_fd),
+        frames_forwarded=0,
+        frame_events=0,
+        frame_writes=0,
+    )
+
+
+def test_forward_records_remaps_buttons(pipes, monkeypatch):
+    monkeypatch.setattr(
+        devices, "handycon", passthrough_controller(pipes, swap_face_buttons())
+    )
+    reader = RawReader(pipes.controller)
+    pipes.write(button_frame(e.BTN_SOUTH, 1) + button_frame(e.BTN_NORTH, 1))
+    assert devices.forward_records(reader, 0, reader.read_now(0)) == 0
+
+    assert pipes.read() == [
+        (e.EV_MSC, e.MSC_SCAN, 589825),
+        (e.EV_KEY, e.BTN_EAST, 1),
+        (e.EV_ABS, e.ABS_X, 100),
+        (e.EV_SYN, e.SYN_REPORT, 0),
+        (e.EV_MSC, e.MSC_SCAN, 589825),
+        (e.EV_KEY, e.BTN_NORTH, 1),
+        (e.EV_ABS, e.ABS_X, 100),
+        (e.EV_SYN, e.SYN_REPORT, 0),
+    ]
+
+
+def test_forward_records_without_remap(pipes, monkeypatch):
+    monkeypatch.setattr(devices, "handycon", passthrough_controller(pipes, None))
+    reader = RawReader(pipes.controller)
+    pipes.write(button_frame(e.BTN_SOUTH, 1))
+    devices.forward_records(reader, 0, reader.read_now(0))
+
+    assert (e.EV_KEY, e.BTN_SOUTH, 1) in pipes.read()
+
+
+# A frame is written once its SYN_REPORT arrives, so a split read holds the
+# start of it back.
+def test_forward_records_carries_partial_frames(pipes, monkeypatch):
+    monkeypatch.setattr(
+        devices, "handycon", passthrough_controller(pipes, swap_face_buttons())
+    )
+    reader = RawReader(pipes.controller)
+    frame = button_frame(e.BTN_EAST, 0)
+    pipes.write(frame[:2])
+    pending = devices.forward_records(reader, 0, reader.read_now(0))
+    assert pending == 2
+    assert pipes.read() == []
+
+    pipes.write(frame[2:])
+    assert devices.forward_records(reader, pending, reader.read_now(pending)) == 0
+    assert (e.EV_KEY, e.BTN_SOUTH, 0) in pipes.read()
+
+
+def test_passthrough_thread_remaps_buttons(pipes):
+    remap = swap_face_buttons()
+    thread = PassthroughThread(
+        pipes.controller, pipes.ui_fd, logging.getLogger("handycon"), remap=remap
+    )
+    thread.start()
+    try:
+        pipes.write(button_frame(e.BTN_SOUTH, 1))
+        assert (e.EV_KEY, e.BTN_EAST, 1) in pipes.read(timeout=5)
+
+        # A reload updates the array in place.
+        remap[e.BTN_SOUTH] = e.BTN_WEST
+        pipes.write(button_frame(e.BTN_SOUTH, 0))
+        assert (e.EV_KEY, e.BTN_WEST, 0) in pipes.read(timeout=5)
+    finally:
+        thread.finish()
+    assert thread.error is None
+    assert thread.frames_forwarded == 2
+
+
+# A [Gamepad Map] added by a reload reaches a thread started without a remap.
+def test_passthrough_thread_takes_a_new_remap(pipes, monkeypatch):
+    thread = PassthroughThread(
+        pipes.controller, pipes.ui_fd, logging.getLogger("handycon")
+    )
+    handycon = passthrough_controller(pipes, None)
+    handycon.passthrough_thread = thread
+    monkeypatch.setattr(utilities, "handycon", handycon)
+    thread.start()
+    try:
+        pipes.write(button_frame(e.BTN_SOUTH, 1))
+        assert (e.EV_KEY, e.BTN_SOUTH, 1) in pipes.read(timeout=5)
+
+        utilities.update_controller_remap({e.BTN_SOUTH: e.BTN_EAST})
+        pipes.write(button_frame(e.BTN_SOUTH, 0))
+        assert (e.EV_KEY, e.BTN_EAST, 0) in pipes.read(timeout=5)
+    finally:
+        thread.finish()
+    assert thread.error is None
+    assert thread.remap is handycon.controller_remap
+
+
+# The controller node in the fake input tree, read from the controller pipe.
+class PipeDevice:
+    fd = None
+
+    def __init__(self, path):
+        os.stat(path)
+        self.path = path
+        self.name = GAMEPAD_NAME
+        self.phys = GAMEPAD_PHYS
+
+    def grab(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def stick_frame():
+    sec, nsec = divmod(time.monotonic_ns(), 1_000_000_000)
+    usec = nsec // 1000
+    return [
+        (sec, usec, e.EV_ABS, e.ABS_X, 100),
+        (sec, usec, e.EV_ABS, e.ABS_Y, 100),
+        (sec, usec, e.EV_SYN, e.SYN_REPORT, 0),
+    ]
+
+
+# Discovery used to sleep on the event loop after every failed scan, so a
+# missing keyboard stalled the controller passthrough for DETECT_DELAY at a
+# time. The record timestamps are CLOCK_MONOTONIC, as when latency is measured.
+def test_passthrough_latency_while_keyboard_absent(
+    pipes, input_tree, tmp_path, monkeypatch
+):
+    input_tree.plug(5, GAMEPAD_NAME, GAMEPAD_PHYS)
+    monkeypatch.setattr(PipeDevice, "fd", pipes.controller)
+    monkeypatch.setattr(devices, "InputDevice", PipeDevice)
+    monkeypatch.setattr(devices, "HIDE_PATH", input_tree.hide)
+    histogram = LatencyHistogram("Controller")
+    handycon = passthrough_controller(pipes, None)
+    handycon.__dict__.update(
+        logger=logging.getLogger("handycon"),
+        device_index=input_tree.index(),
+        GAMEPAD_NAME=GAMEPAD_NAME,
+        GAMEPAD_ADDRESS=GAMEPAD_PHYS,
+        KEYBOARD_NAME="AT Translated Set 2 keyboard",
+        KEYBOARD_ADDRESS="isa0060/serio0/input0",
+        CAPTURE_CONTROLLER=True,
+        CAPTURE_KEYBOARD=True,
+        controller_device=None,
+        controller_event=None,
+        controller_path=None,
+        keyboard_device=None,
+        measure_latency=False,
+        running=True,
+        read_backend="raw",
+        realtime_thread=False,
+        handheld=SimpleNamespace(process_event=None),
+    )
+    monkeypatch.setattr(devices, "handycon", handycon)
+    get_controller = devices.get_controller
+
+    def measured_get_controller():
+        found = get_controller()
+        handycon.controller_latency = histogram
+        return found
+
+    monkeypatch.setattr(devices, "get_controller", measured_get_controller)
+    scans = []
+    get_keyboard = devices.get_keyboard
+
+    def counted_get_keyboard():
+        scans.append(None)
+        return get_keyboard()
+
+    monkeypatch.setattr(devices, "get_keyboard", counted_get_keyboard)
+
+    def feed():
+        end = time.monotonic() + FEED_TIME
+        while time.monotonic() < end:
+            pipes.write(stick_frame())
+            time.sleep(FEED_PERIOD)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        handycon.hotplug = hotplug.HotplugMonitor(
+            loop,
+            handycon.logger,
+            handycon.device_index,
+            procdevices.ProcDevices(str(tmp_path / "devices")),
+            RETRY_DELAY,
+        )
+        tasks = [
+            asyncio.ensure_future(devices.capture_controller_events()),
+            asyncio.ensure_future(devices.capture_keyboard_events()),
+        ]
+        while not handycon.controller_device:
+            await asyncio.sleep(RETRY_DELAY)
+        await asyncio.to_thread(feed)
+        await asyncio.sleep(FEED_PERIOD)
+        handycon.running = False
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert len(scans) > FEED_TIME / RETRY_DELAY / 2
+    assert handycon.keyboard_device is None
+    assert histogram.total > FEED_TIME / FEED_PERIOD / 2
+    assert histogram.percentile(0.99) < MAX_P99_US, str(histogram)
+    assert histogram.max < MAX_LATENCY_US, str(histogram)